@@ -1,6 +1,7 @@
 import sys
 sys.path.append('../')
 import computer
+import symbolic
 
 FILENAME = 'input.dat'
 
@@ -13,8 +14,8 @@ def main(filename):
     program = computer.Program(instructions)
 
     # Change some values in the program.
-    program.instructions[1] = 12
-    program.instructions[2] = 2
+    program.setMemory(1, 12)
+    program.setMemory(2, 2)
 
     # Execute the program to get the result of part one.
     program.execute()
@@ -22,22 +23,16 @@ def main(filename):
     # Print the result.
     print('Value at position 0 after execution: {}'.format(program.instructions[0]))
 
-    # Try all nouns and verbs possible to get the result of part two.
-    for noun in range(0, 100):
-        for verb in range(0, 100):
-            # Reset the program to the initial memory.
-            program = computer.Program(instructions)
-
-            # Change the noun and verb.
-            program.instructions[1] = noun
-            program.instructions[2] = verb
-
-            # Execute the program.
-            program.execute()
-
-            if program.instructions[0] == 19690720:
-                print('100 * noun + verb: {}'.format(100 * noun + verb))
-                return
+    # Execute the program once with symbols for the noun and the verb, and solve the
+    # value left at position 0 for them instead of trying all of them.
+    symbolicProgram = symbolic.SymbolicProgram(instructions)
+    symbolicProgram.setMemory(1, symbolic.symbol('noun'))
+    symbolicProgram.setMemory(2, symbolic.symbol('verb'))
+    for path in symbolicProgram.execute():
+        solutions = symbolic.solve(path.memory[0], 19690720, {'noun': range(0, 100), 'verb': range(0, 100)}, path)
+        if len(solutions) > 0:
+            print('100 * noun + verb: {}'.format(100 * solutions[0]['noun'] + solutions[0]['verb']))
+            return
 
 if __name__ == '__main__':
     main(FILENAME)
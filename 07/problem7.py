@@ -1,6 +1,7 @@
 import sys
 sys.path.append('../')
 import computer
+import network
 import math
 import pdb
 
@@ -21,8 +22,9 @@ def main(filename):
 # Solves the first part of the problem.
 def solvePartOne(filename):
 
-    # Load the amplifier software.
-    amplifierSoftware = computer.readInstructionsFromFile(filename)
+    # Load the amplifier software. A single program is reset before every run.
+    program = computer.Program(computer.readInstructionsFromFile(filename))
+    program.printOutputs(False)
 
     # Create a table with all possible settings.
     settings = []
@@ -55,11 +57,10 @@ def solvePartOne(filename):
                     results[i][j] = results[i - 1][j]
                     continue
             
-            # Get a copy of the amplifier software and decide the input value.
-            program = computer.Program(amplifierSoftware)
+            # Reset the amplifier software and decide the input value.
+            program.reset()
             currentInput = results[i][j - 1] if j - 1 >= 0 else 0
             program.setInputs([settings[i][j], currentInput])
-            program.printOutputs(False)
 
             # Run the operation.
             program.execute()
@@ -79,8 +80,17 @@ def solvePartOne(filename):
 
 def solvePartTwo(filename):
 
-    # Load the amplifier software.
-    amplifierSoftware = computer.readInstructionsFromFile(filename)
+    # Load the amplifier software once, shared by the five amplifiers, and connect
+    # each one to the next in a loop.
+    amplifierSoftware = computer.ProgramImage(computer.readInstructionsFromFile(filename))
+    amplifiers = []
+    loop = network.Network()
+    for i in range(5):
+        amplifiers.append(computer.Program(amplifierSoftware))
+        amplifiers[i].printOutputs(False)
+        loop.addProgram(i, amplifiers[i])
+    for i in range(5):
+        loop.connect(i, (i + 1) % 5)
 
     # Create a table with all possible settings.
     settings = []
@@ -89,59 +99,30 @@ def solvePartTwo(filename):
         settings.append(copyList(currentSettings))
         currentSettings = getNextPermutation(currentSettings, 5, 5)
     
-    # Create an array for the five amplifiers.
-    amplifiers = []
-    for i in range(5):
-        amplifiers.append(computer.Program())
-        amplifiers[i].printOutputs(False)
-        amplifiers[i].returnOnFirstOutput(True)
-        amplifiers[i].setInputs([])
-
     # Calculate results and keep the best.
     bestResult = - math.inf
     for i in range(len(settings)):
-
-        # Reset the software of all the amplifiers.
-        for j in range(len(amplifiers)):
-            amplifiers[j].setInstructions(amplifierSoftware)
-            amplifiers[j].resetPosition()
-            amplifiers[j].emptyOutputs()
-
-            # Establish the settings of all five amplifiers.
-            amplifiers[j].setInputs([settings[i][j]])
-
-        
-        # Execute in a loop until one of the programs halts with a HALT instruction.
-        currentInput = 0
-        lastFinishResult = computer.FINISH_ERROR
-        index = 0
-        while True:
-
-            # Set the input for the next amplifier.
-            amplifiers[index].appendToInputs([currentInput])
-
-            # Execute the 'index' amplifier with the previous input.
-            amplifiers[index].emptyOutputs()
-            amplifiers[index].returnOnFirstOutput(True)
-            lastFinishResult = amplifiers[index].execute()
-
-            # Break if the program reached a HALT instruction.
-            if lastFinishResult == computer.FINISH_HALT:
-                break
-
-            # Get the output of the previous run.
-            currentInput = amplifiers[index].getOutputs()[0]
-
-            # Update the index.
-            index = (index + 1) % len(amplifiers)
-        
-        # Store, in results, the last output from the last amplifier.
-        result = amplifiers[4].getOutputs()[0]
+        result = runAmplifierLoop(loop, amplifiers, settings[i])
         if result > bestResult:
             bestResult = result
     
     return bestResult
 
+# Resets the amplifiers and runs the loop connecting them until they halt, and
+# returns the last output of the last amplifier.
+def runAmplifierLoop(loop, amplifiers, settings):
+
+    # Every amplifier receives its setting first, and the first one also a 0.
+    for i in range(len(amplifiers)):
+        amplifiers[i].reset()
+        loop.send(i, [settings[i]])
+    loop.send(0, [0])
+
+    # Each amplifier runs until it waits for the outputs of the previous one.
+    loop.run()
+
+    return loop.channel(len(amplifiers) - 1, 0).last
+
 
 # Receives a permutation and returns the next one.
 def getNextPermutation(permutation, begin, size):
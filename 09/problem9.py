@@ -8,9 +8,11 @@ if len(sys.argv) == 2:
 
 def main(filename):
 
-    # Get a copy of the BOOST software.
+    # Get a copy of the BOOST software. Part two makes a recursive call many times
+    # with the same arguments, so the calls are remembered.
     boostProgram = computer.readProgramFromFile(filename)
     boostProgram.printOutputs(False)
+    boostProgram.setEngine(computer.ENGINE_MEMOIZED)
 
     # Solve part one.
     boostProgram.setInputs([1])
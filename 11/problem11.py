@@ -94,6 +94,9 @@ def paintHull(filename, startingColor):
     paintingRobotSoftware = computer.readProgramFromFile(filename)
     paintingRobotSoftware.printOutputs(False)
 
+    # The outputs of every step are read through a view, without copying them.
+    outputs = paintingRobotSoftware.outputsView()
+
     # Set the initial position and direction of the robot.
     position = Vector(0, 0)
     direction = Vector(0, 1)
@@ -128,7 +131,6 @@ def paintHull(filename, startingColor):
 
         # Execute and grab the output.
         result = paintingRobotSoftware.execute()
-        outputs = paintingRobotSoftware.getOutputs()
         if result == computer.FINISH_HALT:
             break
 
@@ -3,6 +3,7 @@ sys.path.append('../')
 import computer
 import math
 import pdb
+from collections import deque
 
 # Filename where the game is stored.
 FILENAME = 'game.dat'
@@ -118,7 +119,7 @@ def numberOfBlockTiles(instructions):
     game = computer.Program(instructions)
     game.printOutputs(False)
     game.execute()
-    outputs = game.getOutputs()
+    outputs = game.outputsView()
 
     # Count the number of block tiles.
     blocks = 0
@@ -128,13 +129,21 @@ def numberOfBlockTiles(instructions):
     
     return blocks
 
-# Plays the game and returns the score after winning.
-def playGame(instructions):
-
-    # Load the game.
-    game = computer.Program(instructions)
+# Plays the game and returns the score after winning. The game can be recorded,
+# or replayed from a recording without executing it.
+def playGame(instructions, recording=None, replay=None):
+
+    # Load the game. Outputs are collected in a queue that is emptied every turn.
+    if replay != None:
+        game = computer.ReplayProgram(replay, instructions)
+    else:
+        game = computer.Program(instructions)
+    if recording != None:
+        game.record(recording)
     game.setMemory(0, 2)
     game.printOutputs(False)
+    outputs = deque()
+    game.setOutputSink(outputs)
 
     # Define a board.
     board = None
@@ -145,13 +154,14 @@ def playGame(instructions):
         game.pauseBeforeInputInstruction(True)
         result = game.execute()
 
-        # Get the outputs and initialize the board if needed.
-        outputs = game.getOutputs()
+        # Take the outputs of this turn and initialize the board if needed.
+        turnOutputs = list(outputs)
+        outputs.clear()
         if board == None:
-            board = Board(outputs)
+            board = Board(turnOutputs)
         
         # Update the tiles and the score.
-        board.updateWithOutputs(outputs)
+        board.updateWithOutputs(turnOutputs)
 
         # Exit if the game halted.
         if result == computer.FINISH_HALT:
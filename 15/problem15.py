@@ -159,7 +159,7 @@ def solvePartTwo(grid):
 
 # Explores a grid performing flood fill with the help
 # of the robot controller.
-def floodFill(currentLocation, grid, controller, lastLocation=None):
+def floodFill(currentLocation, grid, controller):
     
     # Get this location inside the grid and mark its type.
     if not currentLocation.y in grid.locations:
@@ -190,22 +190,17 @@ def floodFill(currentLocation, grid, controller, lastLocation=None):
                 # Go explore the next direction.
                 continue
 
-        # Try to move the robot to the new location.
-        controller.emptyOutputs()
-        controller.setInputs([movement])
-        controller.returnOnOutputNumber(1)
-        controller.execute()
-        newLocation.type = controller.getOutputs()[0]
+        # Try to move a copy of the robot to the new location, so this one
+        # does not have to walk back afterwards.
+        robot = controller.fork()
+        robot.emptyOutputs()
+        robot.setInputs([movement])
+        robot.returnOnOutputNumber(1)
+        robot.execute()
+        newLocation.type = robot.getOutputs()[0]
 
         # Perform flood fill on this new location, recursively if needed.
-        floodFill(newLocation, grid, controller, currentLocation)
-
-    # If not the starting location, backtrack to the previous location.
-    if lastLocation != None:
-        controller.emptyOutputs()
-        controller.setInputs([currentLocation.movementToReach(lastLocation)])
-        controller.returnOnOutputNumber(1)
-        controller.execute()
+        floodFill(newLocation, grid, robot)
 
 # Receives a grid from the flood fill algorithm and returns a dictionary with the nodes
 # prepared for Dijkstra.
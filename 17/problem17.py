@@ -27,23 +27,13 @@ def solvePartOne(filename):
     # Load the ASCII program from file.
     asciiProgram = computer.readProgramFromFile(filename)
 
-    # Execute it and extract the outputs.
+    # Execute it and extract the outputs as text.
     asciiProgram.printOutputs(False)
     asciiProgram.execute()
-    outputs = asciiProgram.getOutputs()
-
-    # Loop through the outputs and store the information.
-    scaffold = [[]]
-    position = 0
-    for element in outputs:
-        # If new line, add another line to the main list.
-        if str(chr(element)) == '\n':
-            scaffold.append([])
-            position += 1
-            continue
-        
-        # If not a newline, add it to the current line.
-        scaffold[position].append(str(chr(element)))
+    text = asciiProgram.getAsciiOutputs()[0]
+
+    # Store every line as a list of symbols.
+    scaffold = [list(line) for line in text.split('\n')]
     
     # Calculate the alignment parameters.
     return {'scaffold': scaffold, 'total': sumOfAlignmentParameters(scaffold)}
@@ -96,23 +86,12 @@ def solvePartTwo(filename):
     decide = 'n\n'
     inputData = [mainRoutine, routineA, routineB, routineC, decide]
     
-    # Set the inputs and execute the program.
-    inputs = getInputsAsNumbers(inputData)
-    asciiProgram.setInputs(inputs)
+    # Set the inputs and execute the program. The dust collected is the only
+    # output that is not a character.
+    asciiProgram.setAsciiInputs(''.join(inputData))
     asciiProgram.execute()
 
-    return asciiProgram.getOutputs()[-1]
-
-# Receives the lines with the routines and transforms characters
-# to ascii codes in a list.
-def getInputsAsNumbers(inputData):
-
-    inputs = []
-    for line in inputData:
-        for symbol in line:
-            inputs.append(ord(symbol))
-    
-    return inputs
+    return asciiProgram.getAsciiOutputs()[-1]
 
 if __name__ == '__main__':
     main('ascii.dat')
@@ -0,0 +1,244 @@
+# batch.py runs many copies of the same Intcode program in lockstep with NumPy.
+import numpy
+import computer
+
+# Memory added after the program in every lane. Lanes going beyond it continue
+# on a scalar computer.Program.
+EXTRA_MEMORY = 1024
+
+# Maximum number of different instructions executed in the same step. Lanes
+# outside the biggest groups continue on a scalar computer.Program.
+DIVERGENCE_LIMIT = 8
+
+# Operands below this value can be multiplied without leaving int64.
+MULTIPLY_LIMIT = 3037000499
+
+# State of every lane.
+LANE_RUNNING = 0
+LANE_HALTED = 1
+LANE_SCALAR = 2
+
+# Runs the same program in a number of lanes, each one with its own memory,
+# inputs and outputs. Outputs are never printed to the terminal.
+class Batch():
+    def __init__(self, instructions, lanes, extraMemory=EXTRA_MEMORY):
+        self.instructions = computer.copyList(instructions)
+        self.lanes = lanes
+        self.width = len(self.instructions) + extraMemory
+        self.state = numpy.full(lanes, LANE_RUNNING)
+
+        # Lanes keep their memory in the rows of a single array. Programs with
+        # values too big for int64 are executed on scalar programs only.
+        self.memory = numpy.zeros((lanes, self.width), dtype=numpy.int64)
+        self.vectorized = True
+        try:
+            self.memory[:, :len(self.instructions)] = numpy.array(self.instructions, dtype=numpy.int64)
+        except OverflowError:
+            self.vectorized = False
+            self.state[:] = LANE_SCALAR
+
+        # Execution variables of every lane.
+        self.position = numpy.zeros(lanes, dtype=numpy.int64)
+        self.relativeBase = numpy.zeros(lanes, dtype=numpy.int64)
+        self.size = numpy.full(lanes, len(self.instructions), dtype=numpy.int64)
+        self.inputs = [[] for lane in range(lanes)]
+        self.outputs = [[] for lane in range(lanes)]
+
+        # Programs of the lanes that continue on the scalar computer. When the
+        # program does not fit in int64 every lane is a scalar program from the start.
+        self.programs = {}
+        if not self.vectorized:
+            for lane in range(lanes):
+                self.programs[lane] = computer.Program(self.instructions)
+                self.programs[lane].printOutputs(False)
+                self.programs[lane].setOutputSink(self.outputs[lane])
+
+    # Sets a value inside an address for all the lanes. The value can be a single
+    # number or one number for each lane.
+    def setMemory(self, address, values):
+        if not self.vectorized:
+            for lane in range(self.lanes):
+                self.programs[lane].setMemory(address, values[lane] if hasattr(values, '__len__') else values)
+            return
+
+        self.memory[:, address] = values
+
+    # Receives a list with the list of inputs of each lane.
+    def setInputs(self, inputs):
+        self.inputs = [computer.copyList(laneInputs) for laneInputs in inputs]
+
+    # Returns the value at an address for all the lanes.
+    def getMemory(self, address):
+        return [self.getInstructions(lane)[address] if lane in self.programs else int(self.memory[lane, address]) for lane in range(self.lanes)]
+
+    # Returns a copy of the memory used by a lane.
+    def getInstructions(self, lane):
+        if lane in self.programs:
+            return self.programs[lane].getInstructions()
+
+        return self.memory[lane, :self.size[lane]].tolist()
+
+    # Returns a copy of the outputs generated by a lane.
+    def getOutputs(self, lane):
+        if lane in self.programs:
+            return self.programs[lane].getOutputs()
+
+        return computer.copyList(self.outputs[lane])
+
+    # Executes all the lanes until they halt.
+    def execute(self):
+        if not self.vectorized:
+            for lane in range(self.lanes):
+                self.programs[lane].setInputs(self.inputs[lane])
+                self.programs[lane].execute()
+            return
+
+        # Inputs are read from a table, with a column for each input.
+        counts = numpy.array([len(laneInputs) for laneInputs in self.inputs], dtype=numpy.int64)
+        self.inputTable = numpy.zeros((self.lanes, max(1, counts.max(initial=0))), dtype=numpy.int64)
+        for lane in range(self.lanes):
+            self.inputTable[lane, :counts[lane]] = self.inputs[lane]
+        self.inputCount = counts
+        self.inputIndex = numpy.zeros(self.lanes, dtype=numpy.int64)
+
+        active = numpy.flatnonzero(self.state == LANE_RUNNING)
+        while active.size > 0:
+
+            # Lanes that jumped outside their memory continue on their own.
+            outside = (self.position[active] < 0) | (self.position[active] >= self.width)
+            self.toScalar(active[outside])
+            active = active[~outside]
+
+            # Group the lanes by the instruction they execute next.
+            codes = self.memory[active, self.position[active]]
+            groups, counts = numpy.unique(codes, return_counts=True)
+            if len(groups) > DIVERGENCE_LIMIT:
+                kept = groups[numpy.argsort(counts)[-DIVERGENCE_LIMIT:]]
+                diverged = ~numpy.isin(codes, kept)
+                self.toScalar(active[diverged])
+                active = active[~diverged]
+                codes = codes[~diverged]
+                groups = kept
+
+            for code in groups:
+                self.executeGroup(int(code), active[codes == code])
+
+            active = active[self.state[active] == LANE_RUNNING]
+
+        # Finish the lanes that left the batch.
+        for lane in numpy.flatnonzero(self.state == LANE_SCALAR):
+            lane = int(lane)
+            if not lane in self.programs:
+                self.toScalar(numpy.array([lane]))
+            self.programs[lane].execute()
+
+    # Moves some lanes to scalar programs that continue from the same state.
+    def toScalar(self, lanes):
+        for lane in lanes.tolist():
+            if lane in self.programs:
+                continue
+            program = computer.Program(self.memory[lane, :self.size[lane]].tolist())
+            program.printOutputs(False)
+            program.position = int(self.position[lane])
+            program.relativeBase = int(self.relativeBase[lane])
+            program.setInputs(self.inputs[lane][self.inputIndex[lane]:])
+            program.setOutputSink(self.outputs[lane])
+            self.programs[lane] = program
+            self.state[lane] = LANE_SCALAR
+
+    # Executes a single instruction on a group of lanes that share it.
+    def executeGroup(self, code, lanes):
+        opcode = computer.Opcode(code)
+        if opcode.opcode == computer.OPCODE_HALT:
+            self.state[lanes] = LANE_HALTED
+            return
+        if not opcode.opcode in computer.OPCODE_LENGTHS or max(opcode.modes) > computer.PARAM_MODE_RELATIVE:
+            # Let the scalar program report the error.
+            self.toScalar(lanes)
+            return
+
+        # Lanes whose parameters are outside their memory continue on their own.
+        positions = self.position[lanes]
+        valid = positions + opcode.length <= self.width
+        self.toScalar(lanes[~valid])
+        lanes = lanes[valid]
+        positions = positions[valid]
+
+        # Find the address each parameter points to.
+        addresses = []
+        for i in range(opcode.length - 1):
+            cells = self.memory[lanes, positions + i + 1]
+            if opcode.modes[i] == computer.PARAM_MODE_VALUE:
+                addresses.append(None)
+            else:
+                addresses.append(cells + self.relativeBase[lanes] if opcode.modes[i] == computer.PARAM_MODE_RELATIVE else cells)
+        valid = numpy.ones(len(lanes), dtype=bool)
+        for address in addresses:
+            if address is not None:
+                valid &= (address >= 0) & (address < self.width)
+        if not valid.all():
+            self.toScalar(lanes[~valid])
+            lanes = lanes[valid]
+            positions = positions[valid]
+            addresses = [address[valid] if address is not None else None for address in addresses]
+
+        # Read the value of every parameter.
+        self.size[lanes] = numpy.maximum(self.size[lanes], positions + opcode.length)
+        values = []
+        for i in range(len(addresses)):
+            if addresses[i] is None:
+                values.append(self.memory[lanes, positions + i + 1])
+            else:
+                values.append(self.memory[lanes, addresses[i]])
+                self.size[lanes] = numpy.maximum(self.size[lanes], addresses[i] + 1)
+
+        if opcode.opcode == computer.OPCODE_SUM:
+            result = values[0] + values[1]
+            overflow = ((values[0] ^ result) & (values[1] ^ result)) < 0
+            self.storeGroup(lanes, addresses[2], result, overflow)
+            self.position[lanes] += 4
+        elif opcode.opcode == computer.OPCODE_MULTIPLY:
+            overflow = (numpy.abs(values[0]) > MULTIPLY_LIMIT) | (numpy.abs(values[1]) > MULTIPLY_LIMIT)
+            self.storeGroup(lanes, addresses[2], values[0] * values[1], overflow)
+            self.position[lanes] += 4
+        elif opcode.opcode == computer.OPCODE_INPUT:
+            # Lanes without inputs left ask for them on a scalar program.
+            missing = self.inputIndex[lanes] >= self.inputCount[lanes]
+            self.toScalar(lanes[missing])
+            lanes = lanes[~missing]
+            target = addresses[0][~missing] if addresses[0] is not None else None
+            number = self.inputTable[lanes, self.inputIndex[lanes]]
+            self.inputIndex[lanes] += 1
+            self.storeGroup(lanes, target, number, numpy.zeros(len(lanes), dtype=bool))
+            self.position[lanes] += 2
+        elif opcode.opcode == computer.OPCODE_OUTPUT:
+            for lane, value in zip(lanes.tolist(), values[0].tolist()):
+                self.outputs[lane].append(value)
+            self.position[lanes] += 2
+        elif opcode.opcode == computer.OPCODE_JUMP_IF_TRUE:
+            self.position[lanes] = numpy.where(values[0] != 0, values[1], positions + 3)
+        elif opcode.opcode == computer.OPCODE_JUMP_IF_FALSE:
+            self.position[lanes] = numpy.where(values[0] == 0, values[1], positions + 3)
+        elif opcode.opcode == computer.OPCODE_LESS_THAN:
+            self.storeGroup(lanes, addresses[2], (values[0] < values[1]).astype(numpy.int64), None)
+            self.position[lanes] += 4
+        elif opcode.opcode == computer.OPCODE_EQUALS:
+            self.storeGroup(lanes, addresses[2], (values[0] == values[1]).astype(numpy.int64), None)
+            self.position[lanes] += 4
+        elif opcode.opcode == computer.OPCODE_RELBASE_OFFSET:
+            self.relativeBase[lanes] += values[0]
+            self.position[lanes] += 2
+
+    # Stores the result of an instruction for a group of lanes. Lanes whose result
+    # overflowed repeat the instruction on a scalar program.
+    def storeGroup(self, lanes, addresses, results, overflow):
+        if overflow is not None and overflow.any():
+            self.toScalar(lanes[overflow])
+            lanes = lanes[~overflow]
+            results = results[~overflow]
+            addresses = addresses[~overflow] if addresses is not None else None
+
+        # As in the scalar computer, values are not stored in value mode.
+        if addresses is not None:
+            self.memory[lanes, addresses] = results
+            self.size[lanes] = numpy.maximum(self.size[lanes], addresses + 1)
@@ -0,0 +1,325 @@
+# cluster.py runs networks of Intcode programs like network.py, but every program
+# runs in its own worker process. The values go from a program to another one
+# through rings in shared memory, each one written by a single program and read
+# by a single one, so they need no locks. A coordinator hands over the values
+# coming from and going out of the cluster, and stops the workers when all of
+# them halted or are waiting for inputs that no program will send.
+import os
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import computer
+from network import Channel
+
+# Default number of values a ring can hold. A program sending to a full ring waits
+# until its target reads from it.
+RING_CAPACITY = 1 << 12
+
+# Every ring starts with the number of values written and read so far, the last
+# value written and the number of times values were written together. Then come
+# the values, as int64 numbers.
+RING_HEADER = 4
+RING_WRITTEN = 0
+RING_READ = 1
+RING_LAST = 2
+RING_BATCHES = 3
+
+# Every worker has a state, a counter increased on every change of state, the
+# finish code of its program and the ring it waits to send to when blocked. The
+# cell after the states of all the workers tells them to stop.
+STATE_CELLS = 4
+STATE = 0
+STATE_EPOCH = 1
+STATE_RESULT = 2
+STATE_RING = 3
+
+# States of a worker. A blocked worker waits to send to a full ring.
+WORKER_RUNNING = 0
+WORKER_WAITING = 1
+WORKER_BLOCKED = 2
+WORKER_DONE = 3
+
+# Workers and the coordinator start waiting without sleeping, and sleep longer
+# the longer they wait, up to a time in seconds that grows with the number of
+# workers sharing every processor, so waking up does not take the time of the
+# workers running. It never goes over the limit.
+WAIT_STEP = 0.0002
+WAIT_LIMIT = 0.05
+
+# Number of outputs a program sends before they are handed over, if it does not
+# stop before.
+OUTPUT_BATCH = 256
+
+# Values written by a program and read by another one, or by the coordinator,
+# kept in shared memory from the given cell.
+class Ring():
+    def __init__(self, cells, start, capacity):
+        self.cells = cells
+        self.start = start
+        self.capacity = capacity
+
+    # Number of values waiting to be read.
+    def pending(self):
+        return self.cells[self.start + RING_WRITTEN] - self.cells[self.start + RING_READ]
+
+    # Writes as many values as fit, and returns how many were written. The values
+    # are written before the counter, so the reader never sees them half written.
+    def put(self, values):
+        cells = self.cells
+        written = cells[self.start + RING_WRITTEN]
+        count = min(len(values), self.capacity - (written - cells[self.start + RING_READ]))
+        if count <= 0:
+            return 0
+
+        first = self.start + RING_HEADER
+        for i in range(count):
+            cells[first + (written + i) % self.capacity] = values[i]
+        cells[self.start + RING_LAST] = values[count - 1]
+        cells[self.start + RING_BATCHES] += 1
+        cells[self.start + RING_WRITTEN] = written + count
+
+        return count
+
+    # Returns the values waiting to be read.
+    def take(self):
+        cells = self.cells
+        read = cells[self.start + RING_READ]
+        written = cells[self.start + RING_WRITTEN]
+        first = self.start + RING_HEADER
+        values = [cells[first + i % self.capacity] for i in range(read, written)]
+        cells[self.start + RING_READ] = written
+
+        return values
+
+# Programs by name, each one executed by a worker process, and the channels between
+# them. The programs are given as their instructions.
+class Cluster():
+    def __init__(self, capacity=RING_CAPACITY, engine=computer.ENGINE_FAST):
+        self.capacity = capacity
+        self.engine = engine
+        self.programs = {}
+        self.channels = {}
+
+        # Inputs given from outside the cluster, by program, until they are sent.
+        self.inputs = {}
+
+        # Finish code of every program in the last run, and seconds running them.
+        self.results = {}
+        self.seconds = 0.0
+
+    # Adds a program to the cluster. It waits for its inputs instead of asking
+    # for them, and its outputs go to the channels leaving it.
+    def addProgram(self, name, instructions):
+        self.programs[name] = instructions
+        self.inputs[name] = []
+
+    # Connects the outputs of a program to the inputs of another one, or to the
+    # outside of the cluster if there is no target, as in a network. A program
+    # receiving from many others takes the values of each one in order.
+    def connect(self, source, target=None):
+        channel = Channel(source, target)
+        self.channels[(source, target)] = channel
+
+        return channel
+
+    # Returns the channel between two programs.
+    def channel(self, source, target=None):
+        return self.channels[(source, target)]
+
+    # Gives inputs to a program from outside the cluster, sent when it runs.
+    def send(self, name, values):
+        self.inputs[name].extend(values)
+
+    # Starts a worker for every program from its instructions, and runs them until
+    # all of them halt or the ones left are waiting for inputs that no program will
+    # send. Returns FINISH_HALT if all of them halted, FINISH_WAIT_INPUT if some are
+    # waiting, and the finish code of the first one that stopped for any other
+    # reason, or FINISH_ERROR if the programs are blocked sending to each other.
+    def run(self):
+        start = time.perf_counter()
+        names = list(self.programs)
+        index = {name: i for i, name in enumerate(names)}
+
+        # Place a ring for the inputs from outside and for every channel. Workers
+        # read the inputs from outside first.
+        edges = [(None, name) for name in names] + list(self.channels)
+        ringSize = RING_HEADER + self.capacity
+        stop = len(names) * STATE_CELLS
+        first = stop + 1
+        offsets = {edge: first + i * ringSize for i, edge in enumerate(edges)}
+        shared = shared_memory.SharedMemory(create=True, size=8 * (first + len(edges) * ringSize))
+        shared.buf[:8 * (first + len(edges) * ringSize)] = bytes(8 * (first + len(edges) * ringSize))
+        cells = shared.buf.cast('q')
+        try:
+            incoming = {name: [] for name in names}
+            outgoing = {name: [] for name in names}
+            for edge in edges:
+                if edge[1] != None:
+                    incoming[edge[1]].append(offsets[edge])
+                if edge[0] != None:
+                    outgoing[edge[0]].append(offsets[edge])
+
+            # Inputs from outside are there before the programs start, as long as
+            # they fit, so they come before any value sent by other programs.
+            rings = {edge: Ring(cells, offsets[edge], self.capacity) for edge in edges}
+            queued = {}
+            for name in names:
+                values = self.inputs[name]
+                queued[name] = values[rings[(None, name)].put(values):]
+                self.inputs[name] = []
+
+            context = multiprocessing.get_context()
+            waitLimit = min(WAIT_LIMIT, WAIT_STEP * max(1, len(names) / (os.cpu_count() or 1)))
+            workers = []
+            for name in names:
+                arguments = (shared.name, self.programs[name], self.engine, index[name] * STATE_CELLS, stop, incoming[name], outgoing[name], self.capacity, waitLimit)
+                worker = context.Process(target=runWorker, args=arguments, daemon=True)
+                worker.start()
+                workers.append(worker)
+
+            blocked = self.coordinate(names, workers, cells, rings, queued, waitLimit)
+
+            # Stop the workers left and keep their finish codes.
+            cells[stop] = 1
+            for worker in workers:
+                worker.join()
+            self.results = {}
+            for name, worker in zip(names, workers):
+                state = index[name] * STATE_CELLS
+                done = cells[state + STATE] == WORKER_DONE
+                self.results[name] = cells[state + STATE_RESULT] if done else computer.FINISH_ERROR
+            self.collect(rings)
+        finally:
+            cells.release()
+            shared.close()
+            shared.unlink()
+        self.seconds += time.perf_counter() - start
+
+        result = computer.FINISH_HALT
+        for code in self.results.values():
+            if code != computer.FINISH_HALT and code != computer.FINISH_WAIT_INPUT:
+                return code
+            if code == computer.FINISH_WAIT_INPUT:
+                result = code
+
+        return computer.FINISH_ERROR if blocked else result
+
+    # Hands over the values coming from and going out of the cluster until no
+    # worker can go on. Returns True if some worker is blocked sending values.
+    def coordinate(self, names, workers, cells, rings, queued, waitLimit):
+        wait = 0.0
+        while True:
+            for name in names:
+                if len(queued[name]) > 0:
+                    del queued[name][:rings[(None, name)].put(queued[name])]
+            for edge, ring in rings.items():
+                if edge[1] == None:
+                    self.channels[edge].values.extend(ring.take())
+
+            # Nothing can change when no worker is running, neither the waiting ones
+            # nor the coordinator have values to read, the blocked ones wait for full
+            # rings and no worker changed its state while checking it.
+            epochs = [cells[i * STATE_CELLS + STATE_EPOCH] for i in range(len(names))]
+            states = [cells[i * STATE_CELLS + STATE] for i in range(len(names))]
+            stuck = [state != WORKER_BLOCKED or Ring(cells, cells[i * STATE_CELLS + STATE_RING], self.capacity).pending() == self.capacity for i, state in enumerate(states)]
+
+            # Workers that died without finishing stop the cluster. Their state is read
+            # again, as they may have finished since.
+            for i, worker in enumerate(workers):
+                if not worker.is_alive() and cells[i * STATE_CELLS + STATE] != WORKER_DONE:
+                    return False
+
+            if all(state != WORKER_RUNNING for state in states) and all(len(values) == 0 for values in queued.values()):
+                waiting = [name for name, state in zip(names, states) if state == WORKER_WAITING]
+                pending = any(ring.pending() > 0 for edge, ring in rings.items() if edge[1] in waiting or edge[1] == None)
+                if not pending and all(stuck):
+                    if epochs == [cells[i * STATE_CELLS + STATE_EPOCH] for i in range(len(names))]:
+                        return WORKER_BLOCKED in states
+
+            time.sleep(wait)
+            wait = min(waitLimit, wait * 2 + 0.00001)
+
+    # Keeps what the channels carried, and the values that went out of the cluster.
+    def collect(self, rings):
+        for edge, channel in self.channels.items():
+            ring = rings[edge]
+            channel.count = ring.cells[ring.start + RING_WRITTEN]
+            channel.batches = ring.cells[ring.start + RING_BATCHES]
+            channel.last = ring.cells[ring.start + RING_LAST] if channel.count > 0 else None
+            if edge[1] == None:
+                channel.values.extend(ring.take())
+
+    # Returns the values carried per second by every channel, by source and target.
+    def throughput(self):
+        return {edge: channel.count / self.seconds if self.seconds > 0 else 0 for edge, channel in self.channels.items()}
+
+# Executes a program in a worker process, reading its inputs from the rings coming
+# to it and writing its outputs to all the rings leaving it. Values that do not fit
+# in an int64 number stop the program with an error.
+def runWorker(memoryName, instructions, engine, state, stop, incoming, outgoing, capacity, waitLimit):
+    shared = shared_memory.SharedMemory(name=memoryName)
+    cells = shared.buf.cast('q')
+    try:
+        incoming = [Ring(cells, start, capacity) for start in incoming]
+        outgoing = [Ring(cells, start, capacity) for start in outgoing]
+        program = computer.Program(instructions)
+        program.printOutputs(False)
+        program.setEngine(engine)
+        program.waitForInput = True
+        outputs = []
+        program.setOutputSink(outputs)
+
+        result = None
+        while result == None:
+            for ring in incoming:
+                if ring.pending() > 0:
+                    program.appendToInputs(ring.take())
+            program.returnOnOutputNumber(OUTPUT_BATCH)
+            code = program.execute()
+
+            try:
+                for ring in outgoing:
+                    sent = ring.put(outputs)
+                    if sent < len(outputs):
+                        cells[state + STATE_RING] = ring.start
+                        setState(cells, state, WORKER_BLOCKED)
+                        wait = 0.0
+                        while sent < len(outputs) and cells[stop] == 0:
+                            time.sleep(wait)
+                            wait = min(waitLimit, wait * 2 + 0.00001)
+                            sent += ring.put(outputs[sent:])
+                        if sent < len(outputs):
+                            result = computer.FINISH_ERROR
+                            break
+                        setState(cells, state, WORKER_RUNNING)
+            except OverflowError:
+                result = computer.FINISH_ERROR
+            outputs.clear()
+            if result != None:
+                break
+
+            if code == computer.FINISH_WAIT_INPUT:
+                # Wait for values coming to the program, or for the cluster to stop.
+                setState(cells, state, WORKER_WAITING)
+                wait = 0.0
+                while all(ring.pending() == 0 for ring in incoming):
+                    if cells[stop] != 0:
+                        result = code
+                        break
+                    time.sleep(wait)
+                    wait = min(waitLimit, wait * 2 + 0.00001)
+                else:
+                    setState(cells, state, WORKER_RUNNING)
+            elif code != computer.FINISH_OUTPUT:
+                result = code
+
+        cells[state + STATE_RESULT] = result
+        setState(cells, state, WORKER_DONE)
+    finally:
+        cells.release()
+        shared.close()
+
+# Changes the state of a worker, increasing its counter of changes.
+def setState(cells, state, value):
+    cells[state + STATE] = value
+    cells[state + STATE_EPOCH] += 1
@@ -0,0 +1,228 @@
+# benchmark.py measures the Intcode computer running the programs of this
+# repository. Run it from this folder with: python benchmark.py
+# Every run is added to a JSON history and compared with the previous run of the
+# same engine, so changes between commits can be seen.
+import sys
+import json
+import time
+import datetime
+import argparse
+import subprocess
+import tracemalloc
+
+# Import the computer module, the problems and their answers.
+sys.path.append('../')
+sys.path.append('../computer-tests')
+for folder in ['07', '11', '13', '15', '17']:
+    sys.path.append('../' + folder)
+import computer
+import problem7
+import problem11
+import problem13
+import problem15
+import problem17
+from test_computer import ANSWERS
+
+# Default file where the results of every run are kept.
+HISTORY_FILENAME = 'history.json'
+
+# Engines that can be measured, by name.
+ENGINES = {
+    'interpreter': computer.ENGINE_INTERPRETER,
+    'compiled': computer.ENGINE_COMPILED,
+    'fast': computer.ENGINE_FAST,
+    'memoized': computer.ENGINE_MEMOIZED
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the Intcode computer on the programs of this repository.')
+    parser.add_argument('--engine', choices=list(ENGINES), default='interpreter')
+    parser.add_argument('--repeat', type=int, default=3, help='times each workload is timed, the best one is kept')
+    parser.add_argument('--only', default='', help='run only the workloads whose name contains this text')
+    parser.add_argument('--history', default=HISTORY_FILENAME, help='JSON file with the results of previous runs')
+    parser.add_argument('--no-history', action='store_true', help='do not add this run to the history')
+    arguments = parser.parse_args()
+
+    # Find the previous run of the same engine to compare with.
+    history = readHistory(arguments.history)
+    previous = {}
+    for run in history:
+        if run['engine'] == arguments.engine:
+            previous = run['results']
+
+    print('{:<16} {:>9} {:>13} {:>12} {:>11} {:>8}  {}'.format('Workload', 'Time (s)', 'Instructions', 'Instr/s', 'Peak (KiB)', 'Change', 'Check'))
+    results = {}
+    failed = False
+    for name, workload in WORKLOADS:
+        if not arguments.only in name:
+            continue
+
+        result = measure(name, workload, ENGINES[arguments.engine], arguments.repeat)
+        results[name] = result
+        failed = failed or not result['correct']
+
+        change = ''
+        if name in previous:
+            change = '{:+.1f}%'.format(100 * (result['seconds'] / previous[name]['seconds'] - 1))
+        print('{:<16} {:>9.3f} {:>13} {:>12.0f} {:>11.0f} {:>8}  {}'.format(name, result['seconds'], result['instructions'], result['instructionsPerSecond'], result['peakMemory'] / 1024, change, 'ok' if result['correct'] else 'WRONG'))
+
+    # Workloads that must not be slower than others doing the same work.
+    for name, other in FASTER_THAN:
+        if name in results and other in results and results[name]['seconds'] > results[other]['seconds']:
+            print('{} is slower than {}'.format(name, other))
+            failed = True
+
+    # Keep this run in the history.
+    if not arguments.no_history:
+        history.append({
+            'commit': currentCommit(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'engine': arguments.engine,
+            'results': results
+        })
+        with open(arguments.history, 'w') as historyFile:
+            json.dump(history, historyFile, indent=2)
+
+    return 1 if failed else 0
+
+# Runs a workload and returns its measures. The time is the best of some runs with
+# the engine requested. The instructions and the peak memory come from another run
+# with the profiled engine, that is slower, so it does not affect the time.
+def measure(name, workload, engine, repeat):
+    computer.defaultEngine = engine
+    times = []
+    correct = True
+    for i in range(repeat):
+        start = time.perf_counter()
+        answer = workload()
+        times.append(time.perf_counter() - start)
+        correct = correct and answer == ANSWERS[name]
+
+    computer.defaultEngine = computer.ENGINE_PROFILED
+    computer.sharedProfile = computer.Profile()
+    tracemalloc.start()
+    workload()
+    peakMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    instructions = computer.sharedProfile.instructions
+    computer.sharedProfile = None
+    computer.defaultEngine = computer.ENGINE_INTERPRETER
+
+    seconds = min(times)
+    return {
+        'seconds': seconds,
+        'instructions': instructions,
+        'instructionsPerSecond': instructions / seconds if seconds > 0 else 0,
+        'peakMemory': peakMemory,
+        'correct': correct
+    }
+
+# Returns the list of previous runs, empty if there are none.
+def readHistory(filename):
+    try:
+        with open(filename, 'r') as historyFile:
+            return json.load(historyFile)
+    except FileNotFoundError:
+        return []
+
+# Returns the commit checked out, or None outside of a git repository.
+def currentCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Executes a program with some inputs and returns its last output.
+def lastOutput(filename, inputs):
+    program = computer.readProgramFromFile(filename)
+    program.printOutputs(False)
+    program.setInputs(inputs)
+    program.execute()
+
+    return program.getOutputs()[-1]
+
+# Part one of problem 2.
+def problem2PartOne():
+    program = computer.readProgramFromFile('../02/input.dat')
+    program.setMemory(1, 12)
+    program.setMemory(2, 2)
+    program.execute()
+
+    return program.instructions[0]
+
+# Part two of problem 2, trying every noun and verb instead of stopping at the
+# answer so the work done is always the same.
+def problem2Sweep():
+    program = computer.readProgramFromFile('../02/input.dat')
+    answer = None
+    for noun in range(0, 100):
+        for verb in range(0, 100):
+            program.reset()
+            program.setMemory(1, noun)
+            program.setMemory(2, verb)
+            program.execute()
+            if program.instructions[0] == 19690720:
+                answer = 100 * noun + verb
+
+    return answer
+
+# The same sweep creating a new program every time, to compare with the one that
+# resets the program.
+def problem2SweepFresh():
+    instructions = computer.readInstructionsFromFile('../02/input.dat')
+    answer = None
+    for noun in range(0, 100):
+        for verb in range(0, 100):
+            program = computer.Program(instructions)
+            program.setMemory(1, noun)
+            program.setMemory(2, verb)
+            program.execute()
+            if program.instructions[0] == 19690720:
+                answer = 100 * noun + verb
+
+    return answer
+
+# Recording of the game of problem 13, made the first time it is replayed. That
+# first run is slower, so it is not the one kept when there are more.
+gameRecording = None
+
+# Part two of problem 13 replayed from a recording, so only the code playing the
+# game is measured.
+def problem13Replay():
+    global gameRecording
+    instructions = computer.readInstructionsFromFile('../13/game.dat')
+    if gameRecording == None:
+        gameRecording = computer.Recording()
+        problem13.playGame(instructions, recording=gameRecording)
+
+    return problem13.playGame(instructions, replay=gameRecording)
+
+# Workloads measured, by name. Their answers are in the tests of the computer.
+WORKLOADS = [
+    ('02 part 1', problem2PartOne),
+    ('02 sweep', problem2Sweep),
+    ('02 sweep fresh', problem2SweepFresh),
+    ('05 input 1', lambda: lastOutput('../05/input.dat', [1])),
+    ('05 input 5', lambda: lastOutput('../05/input.dat', [5])),
+    ('07 part 1', lambda: problem7.solvePartOne('../07/input.dat')['bestOutput']),
+    ('07 part 2', lambda: problem7.solvePartTwo('../07/input.dat')),
+    ('09 part 1', lambda: lastOutput('../09/input.dat', [1])),
+    ('09 part 2', lambda: lastOutput('../09/input.dat', [2])),
+    ('11 black start', lambda: problem11.paintHull('../11/input.dat', problem11.BLACK)['paintings']),
+    ('11 white start', lambda: problem11.paintHull('../11/input.dat', problem11.WHITE)['paintings']),
+    ('13 blocks', lambda: problem13.numberOfBlockTiles(computer.readInstructionsFromFile('../13/game.dat'))),
+    ('13 game', lambda: problem13.playGame(computer.readInstructionsFromFile('../13/game.dat'))),
+    ('13 game replay', problem13Replay),
+    ('15 exploration', lambda: problem15.solvePartOne(problem15.exploreGrid('../15/controller.dat'))),
+    ('17 part 1', lambda: problem17.solvePartOne('../17/ascii.dat')['total']),
+    ('17 part 2', lambda: problem17.solvePartTwo('../17/ascii.dat'))
+]
+
+# Pairs of workloads where the first one reuses what the second one builds again,
+# so it has to be faster.
+FASTER_THAN = [
+    ('02 sweep', '02 sweep fresh')
+]
+
+if __name__ == '__main__':
+    sys.exit(main())
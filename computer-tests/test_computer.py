@@ -1,13 +1,67 @@
 import unittest
+import os
 import sys
+import asyncio
+import tempfile
+from collections import deque
 
 # Import the computer module.
 sys.path.append('../')
 import computer
+import disassembler
+import symbolic
+import network
+import cluster
+
+# The batch engine needs NumPy.
+try:
+    import batch
+except ImportError:
+    batch = None
+
+# Answers of the problems to the inputs in this repository. The benchmarks check
+# their results against them too.
+ANSWERS = {
+    '02 part 1': 3706713,
+    '02 sweep': 8609,
+    '02 sweep fresh': 8609,
+    '05 input 1': 16434972,
+    '05 input 5': 16694270,
+    '07 part 1': 262086,
+    '07 part 2': 5371621,
+    '09 part 1': 2662308295,
+    '09 part 2': 63441,
+    '11 black start': 2211,
+    '11 white start': 249,
+    '13 blocks': 380,
+    '13 game': 18647,
+    '13 game replay': 18647,
+    '15 exploration': 242,
+    '15 oxygen': 276,
+    '17 part 1': 6052,
+    '17 part 2': 752491
+}
 
 # Class to completely test the computer, one function for each problem.
 class TestComputer(unittest.TestCase):
 
+    # Executes a program with an engine and with the plain interpreter, without
+    # fused instructions, and checks that both finish in the same state. Returns
+    # the program executed with the engine.
+    def assertSameAsInterpreter(self, instructions, inputs, engine):
+        programs = []
+        for reference in [True, False]:
+            program = computer.Program(instructions)
+            program.printOutputs(False)
+            program.setEngine(computer.ENGINE_INTERPRETER if reference else engine)
+            program.fuseInstructions(not reference)
+            program.setInputs(inputs)
+            programs.append((program.execute(), program))
+        states = [(result, program.getInstructions(), program.getOutputs(), program.position, program.relativeBase) for result, program in programs]
+        self.assertEqual(states[1], states[0])
+
+        return programs[1][1]
+
     # Test the cases that appear in problem 2.
     def testProblem2(self):
         program = computer.Program()
@@ -47,7 +101,7 @@ class TestComputer(unittest.TestCase):
         outputs = program.getOutputs()
         for i in range(len(outputs) - 1):
             self.assertEqual(outputs[i], 0)
-        self.assertEqual(outputs[-1], 16434972)
+        self.assertEqual(outputs[-1], ANSWERS['05 input 1'])
 
         # Test input equal to 8 using position mode.
         program.setInstructions([3,9,8,9,10,9,4,9,99,-1,8])
@@ -153,7 +207,7 @@ class TestComputer(unittest.TestCase):
         program.printOutputs(False)
         program.setInputs([5])
         program.execute()
-        self.assertEqual(program.getOutputs()[0], 16694270)
+        self.assertEqual(program.getOutputs()[0], ANSWERS['05 input 5'])
     
     # The tests for problem 7 are inside that folder.
 
@@ -184,12 +238,814 @@ class TestComputer(unittest.TestCase):
         program.printOutputs(False)
         program.setInputs([1])
         program.execute()
-        self.assertEqual(program.getOutputs()[0], 2662308295)
+        self.assertEqual(program.getOutputs()[0], ANSWERS['09 part 1'])
+        program = computer.readProgramFromFile('../09/input.dat')
+        program.printOutputs(False)
+        program.setInputs([2])
+        program.execute()
+        self.assertEqual(program.getOutputs()[0], ANSWERS['09 part 2'])
+    
+    # A program that overwrites an instruction it already executed has to
+    # see the new instruction the next time it reaches that address.
+    def testSelfModifyingProgram(self):
+        program = computer.Program([104,1,1101,0,99,0,1105,1,0])
+        program.printOutputs(False)
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getOutputs(), [1])
+        self.assertEqual(program.getInstructions(), [99,1,1101,0,99,0,1105,1,0])
+
+        # Changing an instruction from outside also takes effect.
+        program = computer.Program([104,1,99])
+        program.printOutputs(False)
+        program.execute()
+        program.setMemory(0, 99)
+        program.resetPosition()
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getOutputs(), [1])
+    
+    # Memory far away from the program is only allocated when written, and reading
+    # an address never written returns 0.
+    def testSparseMemory(self):
+        program = computer.Program([1101,5,6,1000000000,4,1000000000,4,2000000000,99])
+        program.printOutputs(False)
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getOutputs(), [11, 0])
+        self.assertEqual(program.length, 2000000001)
+        self.assertEqual(len(program.instructions.farPages), 1)
+
+        # Addresses read or written extend the memory like before.
+        program = computer.Program([1101,1,1,12,99])
+        program.printOutputs(False)
+        program.execute()
+        self.assertEqual(program.getInstructions(), [1101,1,1,12,99,0,0,0,0,0,0,0,2])
+
+        # Writing to the memory like a list forgets the instructions decoded there.
+        program = computer.Program([104,1,99])
+        program.printOutputs(False)
+        program.execute()
+        program.instructions[0] = 99
+        program.resetPosition()
+        program.emptyOutputs()
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getOutputs(), [])
+
+        # Pages are typed until a value that does not fit in 64 bits is written, and
+        # then only that page becomes a list.
+        instructions = [1102,2 ** 35,2 ** 35,7,4,7,99,0,1101,0,0,2000,99]
+        for engine in [computer.ENGINE_INTERPRETER, computer.ENGINE_COMPILED, computer.ENGINE_FAST]:
+            program = computer.Program(instructions)
+            program.printOutputs(False)
+            program.setEngine(engine)
+            program.setMemory(5000, 1)
+            self.assertIsInstance(program.instructions.pages[0], computer.array)
+            self.assertEqual(program.execute(), computer.FINISH_HALT)
+            self.assertEqual(program.getOutputs(), [2 ** 70])
+            self.assertIsInstance(program.instructions.pages[0], list)
+            self.assertIsInstance(program.instructions.pages[4], computer.array)
+            self.assertIsInstance(program.image.memory.pages[0], computer.array)
+    
+    # The compiled engine has to give the same results as the interpreter.
+    def testCompiledEngine(self):
+        for filename, inputs in [('../05/input.dat', [1]), ('../05/input.dat', [5]), ('../09/input.dat', [1]), ('../09/input.dat', [2])]:
+            self.assertSameAsInterpreter(computer.readInstructionsFromFile(filename), inputs, computer.ENGINE_COMPILED)
+
+        # Jump targets are read even when the jump is not taken.
+        for instructions in [[6,5,20,99,0,1], [5,4,20,99,0]]:
+            self.assertSameAsInterpreter(instructions, [], computer.ENGINE_COMPILED)
+        for instructions in [[6,5,-3,99,0,1], [5,4,-3,99,0], [1106,0,-3,99]]:
+            program = computer.Program(instructions)
+            self.assertRaises(IndexError, program.execute)
+            program = computer.Program(instructions)
+            program.setEngine(computer.ENGINE_COMPILED)
+            self.assertRaises(IndexError, program.execute)
+
+        # Writing over a compiled instruction drops its block.
+        program = computer.Program([104,1,1101,0,99,0,1105,1,0])
+        program.printOutputs(False)
+        program.setEngine(computer.ENGINE_COMPILED)
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getOutputs(), [1])
+
+        # A loop that adds up an array by changing the address it reads from.
+        program = computer.Program([1,19,20,19,1001,2,1,2,1007,2,23,18,1005,18,0,99,0,0,0,0,5,6,7])
+        program.setEngine(computer.ENGINE_COMPILED)
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getInstructions()[19], 18)
+    
+    # The fast engine has to give the same results as the interpreter, also while
+    # pausing on inputs and returning on outputs.
+    def testFastEngine(self):
+        programs = [
+            (computer.readInstructionsFromFile('../05/input.dat'), [5]),
+            (computer.readInstructionsFromFile('../09/input.dat'), [1]),
+            (computer.readInstructionsFromFile('../09/input.dat'), [2]),
+            ([104,1,1101,0,99,0,1105,1,0], []),
+            ([1,19,20,19,1001,2,1,2,1007,2,23,18,1005,18,0,99,0,0,0,0,5,6,7], []),
+            ([6,5,20,99,0,1], []),
+            # Opcodes with modes that are not used run in the interpreter.
+            ([11104,7,21101,2,3,1,204,1,99], [])
+        ]
+        for instructions, inputs in programs:
+            self.assertSameAsInterpreter(instructions, inputs, computer.ENGINE_FAST)
+
+        program = computer.Program([1106,0,-3,99])
+        program.setEngine(computer.ENGINE_FAST)
+        self.assertRaises(IndexError, program.execute)
+
+        # Far addresses go through the memory.
+        program = computer.Program([1101,5,6,1000000000,4,1000000000,4,2000000000,99])
+        program.printOutputs(False)
+        program.setEngine(computer.ENGINE_FAST)
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getOutputs(), [11, 0])
+        self.assertEqual(program.length, 2000000001)
+
+        # Outputs every input it receives until it receives a 0, one output at a time.
+        program = computer.Program([3,9,4,9,1005,9,0,99,0,0])
+        program.printOutputs(False)
+        program.setEngine(computer.ENGINE_FAST)
+        program.pauseBeforeInputInstruction(True)
+        self.assertEqual(program.execute(), computer.FINISH_PAUSE_INPUT)
+        program.pauseBeforeInputInstruction(False)
+        program.setInputs([3, 0])
+        for result in [computer.FINISH_OUTPUT, computer.FINISH_OUTPUT, computer.FINISH_HALT]:
+            program.returnOnFirstOutput(True)
+            self.assertEqual(program.execute(), result)
+        self.assertEqual(program.getOutputs(), [3, 0])
+
+    def testMemoizedEngine(self):
+        # The last program calls a subroutine that outputs its argument twice.
+        programs = [
+            (computer.readInstructionsFromFile('../05/input.dat'), [5]),
+            (computer.readInstructionsFromFile('../09/input.dat'), [1]),
+            (computer.readInstructionsFromFile('../09/input.dat'), [2]),
+            ([109,100,21101,0,7,1,21101,0,13,0,1105,1,22,21101,0,20,0,1105,1,22,99,0,109,3,204,-2,109,-3,2105,1,0], [])
+        ]
+        for instructions, inputs in programs:
+            program = self.assertSameAsInterpreter(instructions, inputs, computer.ENGINE_MEMOIZED)
+        self.assertEqual(program.getOutputs(), [7, 7])
+        self.assertEqual(program.rememberedCalls, 0)
+
+        # The recursive subroutine of BOOST is made once for every argument and
+        # return address, and the calls remembered are used again after a reset.
         program = computer.readProgramFromFile('../09/input.dat')
         program.printOutputs(False)
+        program.setEngine(computer.ENGINE_MEMOIZED)
+        program.setInputs([2])
+        program.execute()
+        remembered = program.rememberedCalls
+        self.assertLess(remembered, 100)
+        program.reset()
+        program.setInputs([2])
+        program.execute()
+        self.assertEqual(program.getOutputs(), [ANSWERS['09 part 2']])
+        self.assertEqual(program.rememberedCalls, remembered)
+
+    def testLoopSummaries(self):
+        # Counts down from the cell 40, adding a counter to a sum and filling memory
+        # from the address at 18, the start of the loop, or the cell 45.
+        loop = [1105,1,4,99,1006,40,30,1,41,42,42,1001,41,1,41,1101,7,0,50,1001,40,-1,40,1001,18,1,18,1105,1,4,4,42,99]
+        programs = [
+            loop + [0] * 7 + [1000,0,0] + [0] * 7,
+            # Filling over the loop itself runs it one instruction at a time.
+            loop[:18] + [0] + loop[19:] + [0] * 7 + [1000,0,0] + [0] * 7,
+            # A loop with the jump out at the end, stopping when the counter reaches 500.
+            [1101,0,0,30,1001,30,1,30,1002,30,3,31,1,31,32,32,1007,30,500,33,1005,33,4,4,32,99,0,0,0,0,0,0,0,0]
+        ]
+        for instructions in programs:
+            program = self.assertSameAsInterpreter(instructions, [], computer.ENGINE_FAST)
+        self.assertEqual(program.getOutputs(), [sum(3 * i for i in range(1, 501))])
+
+        # Long loops stay summarized, and summaries can be disabled.
+        program = computer.Program(programs[0])
+        program.printOutputs(False)
+        program.setEngine(computer.ENGINE_FAST)
+        program.execute()
+        self.assertEqual(program.getOutputs(), [999 * 1000 // 2])
+        self.assertEqual(program.memoryView()[50:1050], [7] * 1000)
+        self.assertEqual(program.loops[4], computer.LOOP_THRESHOLD)
+        program.reset()
+        program.summarizeLoops(False)
+        program.execute()
+        self.assertEqual(program.getOutputs(), [999 * 1000 // 2])
+
+        # The game of problem 13 plays through inputs and outputs.
+        sys.path.append('../13')
+        import problem13
+        computer.defaultEngine = computer.ENGINE_FAST
+        try:
+            self.assertEqual(problem13.playGame(computer.readInstructionsFromFile('../13/game.dat')), ANSWERS['13 game'])
+        finally:
+            computer.defaultEngine = computer.ENGINE_INTERPRETER
+    
+    # Forks and snapshots continue from the same state without sharing writes.
+    def testSnapshotAndFork(self):
+        # Reads a number, adds it to the accumulator at address 11 and outputs it, forever.
+        program = computer.Program([3,12,1,11,12,11,4,11,1105,1,0,0,0])
+        program.printOutputs(False)
+        program.setInputs([5])
+        program.pauseBeforeInputInstruction(True)
+        program.execute()
+        program.executeInputAfterPause()
+        program.pauseBeforeInputInstruction(True)
+        self.assertEqual(program.execute(), computer.FINISH_PAUSE_INPUT)
+        snapshot = program.snapshot()
+
+        # The fork continues from the same point with its own memory.
+        fork = program.fork()
+        fork.setInputs([10])
+        fork.executeInputAfterPause()
+        fork.pauseBeforeInputInstruction(True)
+        fork.execute()
+        self.assertEqual(fork.getOutputs(), [5, 15])
+        program.setInputs([1])
+        program.executeInputAfterPause()
+        program.pauseBeforeInputInstruction(True)
+        program.execute()
+        self.assertEqual(program.getOutputs(), [5, 6])
+
+        # Restoring goes back to the state of the snapshot.
+        program.restore(snapshot)
+        self.assertEqual(program.getOutputs(), [5])
+        self.assertEqual(program.getInstructions()[11], 5)
+        self.assertEqual(program.execute(), computer.FINISH_PAUSE_INPUT)
+    
+    # Inputs can come from any iterable and outputs can go to any sink.
+    def testStreams(self):
+        # Outputs every input it receives until it receives a 0.
+        instructions = [3,9,4,9,1005,9,0,99,0,0]
+
+        # Inputs from a generator and outputs into a bounded deque.
+        program = computer.Program(instructions)
+        program.printOutputs(False)
+        program.setInputs(number for number in [3, 2, 1, 0])
+        outputs = deque(maxlen=2)
+        program.setOutputSink(outputs)
+        program.execute()
+        self.assertEqual(list(outputs), [1, 0])
+
+        # Inputs from a deque that is fed while the program runs, outputs to a function.
+        inputs = deque([5])
+        received = []
+        program = computer.Program(instructions)
+        program.printOutputs(False)
+        program.setInputs(inputs)
+        program.setOutputSink(lambda value: (received.append(value), inputs.append(value - 1)))
+        program.execute()
+        self.assertEqual(received, [5, 4, 3, 2, 1, 0])
+        self.assertEqual(program.getOutputs(), [])
+
+        # Outputs can be iterated while the program runs.
+        program = computer.Program(instructions)
+        program.printOutputs(False)
+        program.setInputs([7, 8])
+        stream = program.outputStream()
+        self.assertEqual(next(stream), 7)
+        fork = program.fork()
+        program.appendToInputs([0])
+        self.assertEqual(list(stream), [8, 0])
+        fork.appendToInputs(iter([9, 0]))
+        self.assertEqual(list(fork.outputStream()), [8, 9, 0])
+
+        # Once the stream is over the outputs go to the sink of the program again,
+        # and it no longer returns on every output.
+        program.resetPosition()
+        program.setInputs([6, 0])
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getOutputs(), [6, 0])
+
+        # Inputs added behind a generator, many times and across many snapshots,
+        # are read after it in order.
+        program = computer.Program(instructions)
+        program.printOutputs(False)
+        program.setInputs(number for number in range(1, 4))
+        for number in range(3, 0, -1):
+            program.appendToInputs([number] * 100)
+        program.appendToInputs([0])
+        snapshots = [program.snapshot() for i in range(10000)]
+        program.execute()
+        self.assertEqual(len(program.getOutputs()), 304)
+        program.restore(snapshots[-1])
+        program.execute()
+        self.assertEqual(program.getOutputs()[:4], [1, 2, 3, 3])
+        self.assertEqual(program.getOutputs()[-2:], [1, 0])
+    
+    # Views follow the memory and the outputs without copying them.
+    def testViews(self):
+        # Outputs its inputs twice each, and writes the last one at address 100.
+        program = computer.Program([3,100,4,100,4,100,1105,1,0])
+        program.printOutputs(False)
+        program.waitForInput = True
+        memory = program.memoryView()
+        outputs = program.outputsView()
+        self.assertEqual(len(memory), 9)
+        self.assertEqual(memory[100], 0)
+        self.assertEqual(len(memory), 9)
+
+        program.setInputs([7])
+        self.assertEqual(program.execute(), computer.FINISH_WAIT_INPUT)
+        self.assertEqual(memory[100], 7)
+        self.assertEqual(memory[0:3], [3,100,4])
+        self.assertEqual(list(outputs), [7, 7])
+        self.assertEqual(program.outputsSince(1), [7])
+        cursor = len(outputs)
+
+        program.appendToInputs([8])
+        program.execute()
+        self.assertEqual(program.outputsSince(cursor), [8, 8])
+        self.assertEqual(outputs[-1], 8)
+        with self.assertRaises(TypeError):
+            outputs[0] = 1
+        with self.assertRaises(TypeError):
+            memory[0] = 1
+
+        # Outputs kept in a deque are also read from the cursor.
+        sink = deque()
+        program.setOutputSink(sink)
+        program.appendToInputs([9])
+        program.execute()
+        self.assertEqual(program.outputsSince(1), [9])
+        self.assertEqual(program.outputsView()[:], [9, 9])
+    
+    # ASCII programs receive text and send text, with numbers in between.
+    def testAscii(self):
+        self.assertEqual(computer.decodeAscii([72,105,10,1000,-1,65,200]), ['Hi\n', 1000, -1, 'A', 200])
+        self.assertEqual(computer.decodeAscii([65] * 5000 + [2 ** 70] + [66] * 5000), ['A' * 5000, 2 ** 70, 'B' * 5000])
+        self.assertEqual(computer.decodeAscii(deque([10])), ['\n'])
+
+        # Outputs every input it receives until it receives a 0.
+        program = computer.Program([3,9,4,9,1005,9,0,99,0,0])
+        program.printOutputs(False)
+        program.setAsciiInputs('ab\n')
+        program.appendAsciiInputs(b'c\x00')
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getAsciiOutputs(), ['ab\nc\x00'])
+
+        # The camera of problem 17 streams the scaffold line by line.
+        program = computer.readProgramFromFile('../17/ascii.dat')
+        program.printOutputs(False)
+        lines = list(program.asciiStream())
+        reference = computer.readProgramFromFile('../17/ascii.dat')
+        reference.printOutputs(False)
+        reference.execute()
+        self.assertEqual(lines, reference.getAsciiOutputs()[0].split('\n')[:-1])
+
+        # Numbers end the line before them, and the program keeps its outputs as
+        # before once the stream is over.
+        program = computer.Program([104,97,104,98,104,500,104,99,104,100,104,10,99])
+        program.printOutputs(False)
+        self.assertEqual(list(program.asciiStream()), ['ab', 500, 'cd'])
+        program.resetPosition()
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getAsciiOutputs(), ['ab', 500, 'cd\n'])
+    
+    # Networks run the programs with inputs waiting and hand over their outputs.
+    def testNetwork(self):
+        # Outputs every input it receives doubled, forever.
+        doubler = computer.ProgramImage([3,11,102,2,11,11,4,11,1105,1,0,0])
+        programs = {}
+        chain = network.Network()
+        for name in ['a', 'b', 'c', 'd']:
+            programs[name] = computer.Program(doubler)
+            programs[name].printOutputs(False)
+            chain.addProgram(name, programs[name])
+
+        # The first program sends to two others, that both send to the last one.
+        chain.connect('a', 'b')
+        chain.connect('a', 'c')
+        chain.connect('b', 'd')
+        chain.connect('c', 'd')
+        output = chain.connect('d')
+        chain.send('a', [1, 2, 3])
+        self.assertEqual(chain.run(), computer.FINISH_WAIT_INPUT)
+        self.assertEqual(list(output.values), [8, 16, 24, 8, 16, 24])
+        self.assertEqual(chain.channel('a', 'b').count, 3)
+        self.assertEqual(chain.channel('a', 'b').batches, 1)
+        self.assertEqual(chain.channel('d').count, 6)
+        self.assertEqual(set(chain.throughput()), set(chain.channels))
+        self.assertIn('a          b                   3        1', chain.report())
+
+        # Programs are only executed again when they receive inputs.
+        chain.send('c', [5])
+        self.assertEqual(chain.run(), computer.FINISH_WAIT_INPUT)
+        self.assertEqual(output.last, 20)
+
+        # A ring of programs that output every input until a 0 runs until all halt.
+        echo = computer.ProgramImage([3,9,4,9,1005,9,0,99,0,0])
+        ring = network.Network()
+        for name in range(3):
+            ring.addProgram(name, computer.Program(echo))
+            ring.connect(name, (name + 1) % 3)
+        ring.send(0, [7, 0])
+        self.assertEqual(ring.run(), computer.FINISH_HALT)
+        self.assertEqual(ring.channel(2, 0).count, 2)
+        self.assertEqual(ring.channel(2, 0).last, 0)
+
+    def testCluster(self):
+        # The amplifiers of problem 7 in a feedback loop, each one in its own process.
+        amplifier = computer.readInstructionsFromFile('../07/test4.dat')
+        amplifiers = cluster.Cluster()
+        for name, setting in enumerate([9, 8, 7, 6, 5]):
+            amplifiers.addProgram(name, amplifier)
+            amplifiers.send(name, [setting])
+            amplifiers.connect(name, (name + 1) % 5)
+        thrusters = amplifiers.connect(4)
+        amplifiers.send(0, [0])
+        self.assertEqual(amplifiers.run(), computer.FINISH_HALT)
+        self.assertEqual(thrusters.last, 139629729)
+
+        # A chain of programs that output every input until a 0, each one in its own
+        # process, with rings smaller than the values going through them.
+        echo = computer.ProgramImage([3,9,4,9,1005,9,0,99,0,0])
+        chain = cluster.Cluster(capacity=4)
+        for name in range(3):
+            chain.addProgram(name, echo)
+            if name > 0:
+                chain.connect(name - 1, name)
+        output = chain.connect(2)
+        chain.send(0, [7, 8, 9, 10, 11, 0])
+        self.assertEqual(chain.run(), computer.FINISH_HALT)
+        self.assertEqual(list(output.values), [7, 8, 9, 10, 11, 0])
+        self.assertEqual(chain.channel(1, 2).count, 6)
+        self.assertEqual(chain.channel(1, 2).last, 0)
+        self.assertEqual(set(chain.throughput()), set(chain.channels))
+
+        # A program that outputs forever to one that halts is blocked once the
+        # ring is full.
+        blocked = cluster.Cluster(capacity=2)
+        blocked.addProgram('source', computer.ProgramImage([104,1,1105,1,0]))
+        blocked.addProgram('target', computer.ProgramImage([99]))
+        blocked.connect('source', 'target')
+        self.assertEqual(blocked.run(), computer.FINISH_ERROR)
+        self.assertEqual(blocked.results, {'source': computer.FINISH_ERROR, 'target': computer.FINISH_HALT})
+
+        # Programs doubling each other's values stop when they no longer fit in
+        # int64 numbers.
+        doubler = computer.ProgramImage([3,11,102,2,11,11,4,11,1105,1,0,0])
+        pair = cluster.Cluster()
+        pair.addProgram('a', doubler)
+        pair.addProgram('b', doubler)
+        pair.connect('a', 'b')
+        pair.connect('b', 'a')
+        output = pair.connect('b')
+        pair.send('a', [1])
+        self.assertEqual(pair.run(), computer.FINISH_ERROR)
+        self.assertEqual(output.last, 1 << 62)
+
+        # Programs left without inputs finish waiting for them.
+        quiet = cluster.Cluster()
+        quiet.addProgram('a', doubler)
+        quiet.addProgram('b', doubler)
+        quiet.connect('a', 'b')
+        output = quiet.connect('b')
+        quiet.send('a', [1, 2])
+        self.assertEqual(quiet.run(), computer.FINISH_WAIT_INPUT)
+        self.assertEqual(list(output.values), [4, 8])
+
+    # Many programs can run together in an event loop connected by queues.
+    def testAsyncPrograms(self):
+        # Outputs every input it receives plus one, until it receives a 0 that it
+        # outputs before halting.
+        instructions = [3,20,1006,20,14,1001,20,1,20,4,20,1105,1,0,4,20,99,0,0,0,0]
+
+        async def runChain(length, values):
+            queues = [asyncio.Queue() for i in range(length + 1)]
+            for value in values:
+                queues[0].put_nowait(value)
+            programs = [computer.Program(instructions) for i in range(length)]
+            results = await asyncio.gather(*[programs[i].run(queues[i], queues[i + 1]) for i in range(length)])
+            outputs = []
+            while not queues[-1].empty():
+                outputs.append(queues[-1].get_nowait())
+            return results, outputs
+
+        results, outputs = asyncio.run(runChain(30, [5, 1, 0]))
+        self.assertEqual(results, [computer.FINISH_HALT] * 30)
+        self.assertEqual(outputs, [35, 31, 0])
+
+        # Inputs already given are used first, and the config is kept afterwards.
+        program = computer.Program(instructions)
+        program.returnOnFirstOutput(True)
         program.setInputs([2])
+        queue = asyncio.Queue()
+        queue.put_nowait(0)
+        outputs = asyncio.Queue()
+        self.assertEqual(asyncio.run(program.run(queue, outputs)), computer.FINISH_HALT)
+        self.assertEqual([outputs.get_nowait(), outputs.get_nowait()], [3, 0])
+        self.assertEqual(program.numOutputsToReturn, 1)
+        self.assertEqual(program.getOutputs(), [])
+    
+    # Lanes of a batch give the same results as scalar programs.
+    @unittest.skipIf(batch == None, 'NumPy is not installed')
+    def testBatch(self):
+        # Try all nouns and verbs of problem 2 at once.
+        instructions = computer.readInstructionsFromFile('../02/input.dat')
+        lanes = batch.Batch(instructions, 10000)
+        lanes.setMemory(1, [lane // 100 for lane in range(10000)])
+        lanes.setMemory(2, [lane % 100 for lane in range(10000)])
+        lanes.execute()
+        results = lanes.getMemory(0)
+        self.assertEqual(results[1202], ANSWERS['02 part 1'])
+        self.assertEqual(results.index(19690720), ANSWERS['02 sweep'])
+
+        # Lanes with different inputs follow different paths.
+        instructions = [3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104,999,1105,1,46,1101,1000,1,20,4,20,1105,1,46,98,99]
+        lanes = batch.Batch(instructions, 3)
+        lanes.setInputs([[2], [8], [10]])
+        lanes.execute()
+        for lane, expected in enumerate([999, 1000, 1001]):
+            self.assertEqual(lanes.getOutputs(lane), [expected])
+        self.assertEqual(lanes.programs, {})
+
+        program = computer.Program(instructions)
+        program.printOutputs(False)
+        program.setInputs([10])
+        program.execute()
+        self.assertEqual(lanes.getInstructions(2), program.getInstructions())
+
+        # The lane whose square leaves int64 finishes on a scalar program.
+        lanes = batch.Batch([3,9,2,9,9,9,4,9,99,0], 2)
+        lanes.setInputs([[5], [10 ** 10]])
+        lanes.execute()
+        self.assertEqual(lanes.getOutputs(0), [25])
+        self.assertEqual(lanes.getOutputs(1), [10 ** 20])
+        self.assertEqual(list(lanes.programs), [1])
+
+        # Programs that do not fit in int64 keep the values set in every lane.
+        lanes = batch.Batch([1,5,6,0,99,7,10 ** 20], 2)
+        lanes.setMemory(1, [5, 6])
+        lanes.execute()
+        self.assertEqual(lanes.getMemory(0), [10 ** 20 + 7, 2 * 10 ** 20])
+
+    # The disassembler finds the code and its structure without executing it.
+    def testDisassembler(self):
+        analysis = disassembler.analyze(computer.readInstructionsFromFile('../09/input.dat'))
+        self.assertEqual(analysis.subroutines, {922})
+        self.assertEqual(analysis.calls, {912, 939, 954})
+        self.assertIn(970, analysis.returns)
+        self.assertEqual(analysis.blocks[922].successors, [931, 964])
+        self.assertEqual(analysis.selfModifyingWrites, [])
+        self.assertEqual(analysis.unreachableRegions()[0], (63, 64))
+        self.assertIn('   970   jnz 1, [rb+0]                     ; return', disassembler.listing(analysis).split('\n'))
+
+        # A program that writes over its first instruction and jumps back to it.
+        analysis = disassembler.analyze([104,1,1101,0,99,0,1105,1,0])
+        self.assertEqual(analysis.selfModifyingWrites, [(2, 0)])
+        self.assertEqual(sorted(analysis.instructions), [0, 2, 6])
+        self.assertTrue(analysis.mayBeWritten(0))
+
+    # Fused instructions give the same results as executing them one by one.
+    def testFusion(self):
+        programs = [
+            (computer.readInstructionsFromFile('../09/input.dat'), [2]),
+            (computer.readInstructionsFromFile('../05/input.dat'), [5]),
+            # The comparison writes over the opcode of the jump fused with it.
+            ([1107,1,2,4,1005,4,20,12,104,7,99,0], []),
+            # The comparison writes over the cell with the target of the jump.
+            ([1108,1,2,6,1005,6,11,104,5,99,0,104,6,99], [])
+        ]
+        for instructions, inputs in programs:
+            self.assertSameAsInterpreter(instructions, inputs, computer.ENGINE_INTERPRETER)
+
+        # The loop of problem 9 fuses a relative base offset, a comparison and a jump.
+        program = self.assertSameAsInterpreter(programs[0][0], [2], computer.ENGINE_INTERPRETER)
+        self.assertEqual(program.fusions, {computer.FUSION_COMPARE_JUMP: 4, computer.FUSION_OFFSET_STORE: 1})
+
+    # Programs created from the same image share it, and reset to it.
+    def testProgramImage(self):
+        # Outputs 1 and writes over its first instruction, a far address and an
+        # address in a new page, so the next run outputs nothing.
+        image = computer.ProgramImage([104,1,1101,0,99,0,1101,7,0,5000000,1101,8,0,2000,99])
+        program = computer.Program(image)
+        other = computer.Program(image)
+        program.printOutputs(False)
+        program.execute()
+        self.assertEqual(program.getOutputs(), [1])
+        self.assertEqual(program.instructions[0], 99)
+        self.assertEqual(other.instructions[0], 104)
+
+        # Pages written before a snapshot are also restored.
+        program.snapshot()
+        program.reset()
+        self.assertEqual(program.getInstructions(), image.memory.tolist())
+        self.assertEqual(program.instructions[5000000], 0)
+        self.assertEqual(program.length, 15)
         program.execute()
-        self.assertEqual(program.getOutputs()[0], 63441)
+        self.assertEqual(program.getOutputs(), [1])
+        self.assertEqual(program.instructions[2000], 8)
+
+        # Resetting forgets only the code decoded or compiled from cells that
+        # differ from the image. This one outputs 1, writes a halt over it and
+        # jumps back to it.
+        for engine in [computer.ENGINE_INTERPRETER, computer.ENGINE_COMPILED, computer.ENGINE_FAST, computer.ENGINE_MEMOIZED]:
+            reused = computer.Program([104,1,1101,0,99,0,1105,1,0])
+            reused.printOutputs(False)
+            reused.setEngine(engine)
+            for run in range(3):
+                reused.reset()
+                self.assertEqual(reused.execute(), computer.FINISH_HALT)
+                self.assertEqual(reused.getOutputs(), [1])
+            if engine == computer.ENGINE_INTERPRETER:
+                reused.reset()
+                self.assertNotIn(0, reused.decoded)
+                self.assertIn(2, reused.decoded)
+
+        # Programs that came back from a snapshot reset to the image too.
+        program.restore(other.snapshot())
+        program.setMemory(1, 5)
+        program.reset()
+        self.assertEqual(program.getInstructions(), image.memory.tolist())
+
+    # Program files are loaded from binary images rebuilt when the files change.
+    def testProgramImages(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'input.dat')
+            with open(filename, 'w') as programFile:
+                programFile.write('104,1125899906842624,104,{},99\n'.format(10 ** 30))
+
+            instructions = [104,1125899906842624,104,10 ** 30,99]
+            self.assertEqual(computer.readImage(filename), None)
+            self.assertEqual(computer.readInstructionsFromFile(filename), instructions)
+            self.assertEqual(computer.readImage(filename), instructions)
+            self.assertEqual(computer.readInstructionsFromFile(filename), instructions)
+
+            # Changing the file makes the image out of date.
+            with open(filename, 'w') as programFile:
+                programFile.write('1,0,0,0,99\n')
+            os.utime(filename, ns=(0, 0))
+            self.assertEqual(computer.readImage(filename), None)
+            self.assertEqual(computer.readInstructionsFromFile(filename), [1,0,0,0,99])
+            self.assertEqual(computer.readImage(filename).tolist(), [1,0,0,0,99])
+            self.assertIsInstance(computer.readProgramFromFile(filename).image.memory.pages[0], computer.array)
+
+            # Images shorter than their header says are not used, whether the cells or
+            # the big numbers after them are missing.
+            for content, size in [('104,1125899906842624,104,{},99\n'.format(10 ** 30), 8 * 5), ('1,0,0,0,99\n', 8 * 3)]:
+                with open(filename, 'w') as programFile:
+                    programFile.write(content)
+                computer.readInstructionsFromFile(filename)
+                with open(filename + computer.IMAGE_EXTENSION, 'r+b') as imageFile:
+                    imageFile.truncate(computer.IMAGE_HEADER.size + size)
+                self.assertEqual(computer.readImage(filename), None)
+                self.assertEqual(computer.readInstructionsFromFile(filename), [int(number) for number in content.split(',')])
+
+    # The profiled engine counts what a program does.
+    def testProfile(self):
+        # Outputs every input it receives until it receives a 0.
+        instructions = [3,9,4,9,1005,9,0,99,0,0]
+        program = computer.Program(instructions)
+        program.printOutputs(False)
+        program.setEngine(computer.ENGINE_PROFILED)
+        program.pauseBeforeInputInstruction(True)
+        self.assertEqual(program.execute(), computer.FINISH_PAUSE_INPUT)
+        program.pauseBeforeInputInstruction(False)
+        program.setInputs([3, 2, 0])
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(program.getOutputs(), [3, 2, 0])
+
+        profile = program.profile
+        self.assertEqual(profile.instructions, 10)
+        self.assertEqual(profile.outputs, 3)
+        self.assertEqual(profile.opcodes[computer.OPCODE_INPUT], 3)
+        self.assertEqual(profile.hotAddresses(3), [(0, 3), (2, 3), (4, 3)])
+        self.assertGreater(profile.inputTime, 0)
+        self.assertIn('      2          3  out [9]', profile.report(program))
+        self.assertEqual(computer.describeInstruction(program.instructions, 4), 'jnz [9], 0')
+
+    # A recorded session is replayed without executing the program.
+    def testRecordAndReplay(self):
+        # Outputs every input it receives until it receives a 0.
+        instructions = [3,9,4,9,1005,9,0,99,0,0]
+        program = computer.Program(instructions)
+        program.printOutputs(False)
+        recording = computer.Recording()
+        program.record(recording)
+        program.setInputs([3, 2, 0])
+        self.assertEqual(program.execute(), computer.FINISH_HALT)
+        self.assertEqual(recording.events, [(0, 0, 3), (1, 1, 3), (0, 2, 2), (1, 1, 2), (0, 2, 0), (1, 1, 0)])
+        self.assertEqual(recording.values(computer.EVENT_OUTPUT), [3, 2, 0])
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'session.rec')
+            recording.save(filename)
+            replayed = computer.readRecording(filename)
+        self.assertEqual(replayed.events, recording.events)
+        self.assertEqual(replayed.finish, computer.FINISH_HALT)
+
+        # The replay follows the settings of a program.
+        replay = computer.ReplayProgram(replayed, instructions)
+        replay.printOutputs(False)
+        replay.pauseBeforeInputInstruction(True)
+        self.assertEqual(replay.execute(), computer.FINISH_PAUSE_INPUT)
+        replay.pauseBeforeInputInstruction(False)
+        replay.setInputs([3, 2])
+        replay.returnOnFirstOutput(True)
+        self.assertEqual(replay.execute(), computer.FINISH_OUTPUT)
+        replay.waitForInput = True
+        replay.returnOnFirstOutput(False)
+        self.assertEqual(replay.execute(), computer.FINISH_WAIT_INPUT)
+        self.assertEqual(replay.getOutputs(), [3, 2])
+
+        # Inputs different from the recorded ones, or another program, are errors.
+        replay.setInputs([5])
+        self.assertRaises(computer.ReplayError, replay.execute)
+        self.assertRaises(computer.ReplayError, computer.ReplayProgram, replayed, [3,9,4,9,1005,9,0,99,0,1])
+
+        # The game of problem 13 is played again from its recording.
+        sys.path.append('../13')
+        import problem13
+        instructions = computer.readInstructionsFromFile('../13/game.dat')
+        recording = computer.Recording()
+        self.assertEqual(problem13.playGame(instructions, recording=recording), ANSWERS['13 game'])
+        self.assertEqual(problem13.playGame(instructions, replay=recording), ANSWERS['13 game replay'])
+
+    # Results of complete executions are kept and not computed again.
+    def testResultCache(self):
+        image = computer.ProgramImage(computer.readInstructionsFromFile('../09/input.dat'))
+        cache = computer.ResultCache()
+        first = cache.run(image, computer.Job(inputs=[1]))
+        self.assertEqual(first.outputs, [ANSWERS['09 part 1']])
+        self.assertIs(cache.run(image, computer.Job(inputs=[1])), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # Executions that need more inputs are not kept.
+        self.assertEqual(cache.run(image, computer.Job()), None)
+        self.assertEqual(len(cache), 1)
+
+        # The least recently used results are dropped when there is no space.
+        instructions = computer.readInstructionsFromFile('../02/input.dat')
+        cache = computer.ResultCache(capacity=3 * len(instructions))
+        for noun in range(4):
+            cache.run(instructions, computer.Job({1: noun, 2: 0}))
+        cache.run(instructions, computer.Job({1: 1, 2: 0}))
+        cache.run(instructions, computer.Job({1: 4, 2: 0}))
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.size, 3 * len(instructions))
+        self.assertEqual(cache.hits, 1)
+        result = cache.run(instructions, computer.Job({1: 12, 2: 2}))
+        self.assertEqual(result.memory[0], ANSWERS['02 part 1'])
+
+        # Results can be kept in a file for other processes.
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'results.cache')
+            cache = computer.ResultCache(filename=filename)
+            cache.run(instructions, computer.Job({1: 12, 2: 2}))
+            cache.save()
+            cache = computer.ResultCache(filename=filename)
+            self.assertEqual(cache.run(instructions, computer.Job({1: 12, 2: 2})).memory[0], ANSWERS['02 part 1'])
+            self.assertEqual(cache.hits, 1)
+
+    # Programs executed with symbols give expressions that can be solved.
+    def testSymbolic(self):
+        # The value at position 0 in problem 2 depends on the noun and the verb.
+        program = symbolic.SymbolicProgram(computer.readInstructionsFromFile('../02/input.dat'))
+        program.setMemory(1, symbolic.symbol('noun'))
+        program.setMemory(2, symbolic.symbol('verb'))
+        paths = program.execute()
+        self.assertEqual(len(paths), 1)
+        domains = {'noun': range(100), 'verb': range(100)}
+        self.assertEqual(symbolic.solve(paths[0].memory[0], ANSWERS['02 part 1'], domains, paths[0]), [{'noun': 12, 'verb': 2}])
+        solution = symbolic.solve(paths[0].memory[0], 19690720, domains, paths[0])[0]
+        self.assertEqual(100 * solution['noun'] + solution['verb'], ANSWERS['02 sweep'])
+
+        # Outputs the square of the input if it is less than 5, or the input plus 100.
+        program = symbolic.SymbolicProgram([3,30,1007,30,5,31,1005,31,16,1001,30,100,32,1105,1,20,2,30,30,32,4,32,99])
+        program.setInputs([symbolic.symbol('x')])
+        paths = program.execute()
+        self.assertEqual(sorted(repr(path.outputs) for path in paths), ['[x + 100]', '[x^2]'])
+        domains = {'x': range(-20, 20)}
+        self.assertEqual([symbolic.solve(path.outputs[0], 9, domains, path) for path in paths], [[], [{'x': -3}, {'x': 3}]])
+        self.assertEqual([symbolic.solve(path.outputs[0], 104, domains, path) for path in paths], [[], []])
+        self.assertEqual([symbolic.solve(path.outputs[0], 105, domains, path) for path in paths], [[{'x': 5}], []])
+
+        # Jumping to a symbol cannot be followed.
+        program = symbolic.SymbolicProgram([3,4,1105,1,0])
+        program.setInputs([symbolic.symbol('x')])
+        with self.assertRaises(symbolic.SymbolicError):
+            program.execute()
+
+    # Independent executions can run on a pool of processes.
+    def testRunMany(self):
+        # Try some nouns and verbs of problem 2.
+        instructions = computer.readInstructionsFromFile('../02/input.dat')
+        jobs = [computer.Job({1: noun, 2: verb}) for noun in range(10, 13) for verb in range(0, 100)]
+        results = computer.runMany(instructions, jobs, workers=2, cells=[0, 1], chunkSize=16)
+        self.assertEqual(len(results), 300)
+        self.assertEqual(results[202].cells, {0: ANSWERS['02 part 1'], 1: 12})
+
+        # Jobs with inputs return their outputs.
+        instructions = [3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104,999,1105,1,46,1101,1000,1,20,4,20,1105,1,46,98,99]
+        results = computer.runMany(instructions, [computer.Job(inputs=[number]) for number in [2, 8, 10]], workers=2)
+        self.assertEqual([result.outputs for result in results], [[999], [1000], [1001]])
+
+        # Jobs without enough inputs stop waiting for them, the rest still run.
+        results = computer.runMany([3,7,4,7,3,7,99,0], [computer.Job(inputs=[5]), computer.Job(inputs=[6, 0])], workers=1)
+        self.assertEqual([result.outputs for result in results], [[5], [6]])
+
+        # The jobs after the one found are not executed.
+        results = computer.runMany(instructions, [computer.Job(inputs=[number]) for number in range(100)], workers=1, chunkSize=1, stopWhen=lambda result: result.outputs == [1000])
+        self.assertEqual(results[8].outputs, [1000])
+        self.assertEqual(results[-1], None)
     
     # Run a test for problem 15.
     def testProblem15(self):
@@ -200,8 +1056,8 @@ class TestComputer(unittest.TestCase):
         # Load the grid explored by the robot.
         grid = problem15.exploreGrid('../15/controller.dat')
 
-        self.assertEqual(problem15.solvePartOne(grid), 242)
-        self.assertEqual(problem15.solvePartTwo(grid), 276)
+        self.assertEqual(problem15.solvePartOne(grid), ANSWERS['15 exploration'])
+        self.assertEqual(problem15.solvePartTwo(grid), ANSWERS['15 oxygen'])
     
     # Run a test for problem 17.
     def testProblem17(self):
@@ -209,8 +1065,8 @@ class TestComputer(unittest.TestCase):
         sys.path.append('../17')
         import problem17
 
-        self.assertEqual(problem17.solvePartOne('../17/ascii.dat')['total'], 6052)
-        self.assertEqual(problem17.solvePartTwo('../17/ascii.dat'), 752491)
+        self.assertEqual(problem17.solvePartOne('../17/ascii.dat')['total'], ANSWERS['17 part 1'])
+        self.assertEqual(problem17.solvePartTwo('../17/ascii.dat'), ANSWERS['17 part 2'])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,6 +1,17 @@
 # computer.py is the module for executing Intcode programs.
 import pdb
+import os
 import math
+import mmap
+import time
+import struct
+import pickle
+import hashlib
+import zlib
+import itertools
+import concurrent.futures
+from array import array
+from collections import deque, OrderedDict
 
 # Define the opcodes.
 OPCODE_SUM = 1
@@ -14,42 +25,251 @@ OPCODE_EQUALS = 8
 OPCODE_RELBASE_OFFSET = 9
 OPCODE_HALT = 99
 
+# Number of memory cells used by each instruction, opcode included.
+OPCODE_LENGTHS = {
+    OPCODE_SUM: 4,
+    OPCODE_MULTIPLY: 4,
+    OPCODE_INPUT: 2,
+    OPCODE_OUTPUT: 2,
+    OPCODE_JUMP_IF_TRUE: 3,
+    OPCODE_JUMP_IF_FALSE: 3,
+    OPCODE_LESS_THAN: 4,
+    OPCODE_EQUALS: 4,
+    OPCODE_RELBASE_OFFSET: 2,
+    OPCODE_HALT: 1
+}
+
 # Define the parameter modes.
 PARAM_MODE_POSITION = 0
 PARAM_MODE_VALUE = 1
 PARAM_MODE_RELATIVE = 2
 
+# Engines that can execute a program. The interpreter is the reference one, and
+# the profiled engine is the interpreter counting what the program does. The fast
+# engine is a single loop that decodes every instruction with a table. The
+# memoized engine remembers what calls do and skips the ones made again.
+ENGINE_INTERPRETER = 0
+ENGINE_COMPILED = 1
+ENGINE_PROFILED = 2
+ENGINE_FAST = 3
+ENGINE_MEMOIZED = 4
+
+# Engine of the programs created from now on, and the profile they all add to
+# when set. Tools measuring whole problems change them instead of every program.
+defaultEngine = ENGINE_INTERPRETER
+sharedProfile = None
+
+# Pairs of instructions that the interpreter executes as a single one.
+FUSION_COMPARE_JUMP = 'compare and jump'
+FUSION_OFFSET_STORE = 'offset and store'
+
+# Opcodes of the instructions that store a result in memory.
+STORE_OPCODES = [OPCODE_SUM, OPCODE_MULTIPLY, OPCODE_LESS_THAN, OPCODE_EQUALS]
+
+# Names of the instructions when showing them.
+OPCODE_NAMES = {
+    OPCODE_SUM: 'add',
+    OPCODE_MULTIPLY: 'mul',
+    OPCODE_INPUT: 'in',
+    OPCODE_OUTPUT: 'out',
+    OPCODE_JUMP_IF_TRUE: 'jnz',
+    OPCODE_JUMP_IF_FALSE: 'jz',
+    OPCODE_LESS_THAN: 'lt',
+    OPCODE_EQUALS: 'eq',
+    OPCODE_RELBASE_OFFSET: 'arb',
+    OPCODE_HALT: 'halt'
+}
+
+# Table of the fast engine, built the first time it is used.
+fastOpcodes = None
+
+# The fast engine tries to summarize a loop after jumping back to its entry this
+# number of times, if it has at most this number of instructions.
+LOOP_THRESHOLD = 16
+LOOP_LIMIT = 32
+
+# Ways the value deciding if a summarized loop ends can match, as a number that
+# is zero, not zero, negative or not negative.
+MATCH_ZERO = 0
+MATCH_NONZERO = 1
+MATCH_NEGATIVE = 2
+MATCH_NONNEGATIVE = 3
+
+# Opcodes executed by the memoized engine itself. The rest, like inputs and
+# outputs, go through the interpreter and are never part of a remembered call.
+MEMOIZED_OPCODES = [OPCODE_SUM, OPCODE_MULTIPLY, OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE, OPCODE_LESS_THAN, OPCODE_EQUALS, OPCODE_RELBASE_OFFSET]
+
+# The memoized engine follows at most this number of nested calls, and remembers
+# at most this number of calls, with at most this number of different sets of
+# cells read by the calls to an entry.
+CALL_DEPTH_LIMIT = 1 << 12
+CALL_MEMORY_LIMIT = 1 << 16
+CALL_SHAPE_LIMIT = 16
+
+# Calls to an entry are not followed anymore after this number of them did inputs
+# or outputs, or after this number of them were not made before while fewer than
+# one in this number of them were.
+CALL_IMPURE_LIMIT = 8
+CALL_MISS_LIMIT = 256
+CALL_MISS_RATIO = 8
+
+# Maximum number of instructions compiled together in a single block.
+BLOCK_LIMIT = 64
+
+# Opcodes that can be compiled inside a block. Input, output and halt always go
+# through the interpreter.
+COMPILED_OPCODES = [OPCODE_SUM, OPCODE_MULTIPLY, OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE, OPCODE_LESS_THAN, OPCODE_EQUALS, OPCODE_RELBASE_OFFSET]
+
+# Compiled blocks, indexed by their source code so identical programs share them.
+compiledBlocks = {}
+
+# Binary images of program files are kept next to them, with this extension added.
+IMAGE_EXTENSION = '.img'
+
+# Images start with a header with the magic text, a 1 to check the byte order,
+# the modification time and size of the text file they come from, the number of
+# cells and the number of big numbers. Then come the cells as int64 numbers, and
+# the big numbers that do not fit in one, as their index, their length as text
+# and the text itself.
+IMAGE_MAGIC = b'INTCODE1'
+IMAGE_HEADER = struct.Struct('=8sqqqqq')
+IMAGE_BIG_NUMBER = struct.Struct('=qq')
+
+# Default capacity of a result cache, as the number of memory cells and outputs
+# of all the results kept.
+RESULT_CACHE_SIZE = 1 << 22
+
+# Recordings of sessions start with a header with the magic text, the digest of
+# the program image, the number of events and the finish code of the session.
+# Then come the events, compressed, as their kind, the instructions executed since
+# the previous event and their value, written as text so any number fits.
+RECORDING_MAGIC = b'INTREC01'
+RECORDING_HEADER = struct.Struct('=8s64sqq')
+
+# Kinds of events in a recording.
+EVENT_INPUT = 0
+EVENT_OUTPUT = 1
+
+# Number of outputs decoded together as ASCII text, and returned together by the
+# ASCII stream of a program.
+ASCII_CHUNK_SIZE = 4096
+
+# Number of jobs sent together to a worker process by runMany.
+JOB_CHUNK_SIZE = 64
+
+# Program the jobs of a worker process start from, set once when the process starts.
+workerProgram = None
+
+# Memory is split in pages of this size, allocated the first time they are written.
+PAGE_SHIFT = 10
+PAGE_SIZE = 1 << PAGE_SHIFT
+PAGE_MASK = PAGE_SIZE - 1
+
+# Pages below this address are kept in a table indexed by page number, the fast
+# path for dense programs. Pages above it are kept in a dictionary.
+DENSE_LIMIT = 1 << 20
+
+# Pages keep their values as int64 numbers, and become lists of Python integers
+# the first time a value that does not fit is written to them.
+PAGE_TYPECODE = 'q'
+
+# Page shared by all the unallocated addresses of the page table. Never owned by
+# any memory, so it is copied before the first write.
+ZERO_PAGE = array(PAGE_TYPECODE, bytes(8 * PAGE_SIZE))
+
 # Different ways a program can finish its execution.
 FINISH_HALT = 0
 FINISH_OUTPUT = 1
 FINISH_PAUSE_INPUT = 2
 FINISH_AFTER_INPUT = 3
+FINISH_WAIT_INPUT = 4
 FINISH_ERROR = 10
 
 # This class defines a program that can be executed by the Intcode computer.
 class Program():
     # If no instructions are given, set them to an empty list.
     def __init__(self, instructions=[]):
-        # Get a copy of the instructions.
-        self.instructions = copyList(instructions)
-        self.length = len(self.instructions)
         self.opcode = None
+        self.handlers = {
+            OPCODE_SUM: self.executeSum,
+            OPCODE_MULTIPLY: self.executeMultiplication,
+            OPCODE_INPUT: self.executeInput,
+            OPCODE_OUTPUT: self.executeOutput,
+            OPCODE_JUMP_IF_TRUE: self.executeJumpIfTrue,
+            OPCODE_JUMP_IF_FALSE: self.executeJumpIfFalse,
+            OPCODE_LESS_THAN: self.executeLessThan,
+            OPCODE_EQUALS: self.executeEquals,
+            OPCODE_RELBASE_OFFSET: self.executeRelativeBaseOffset,
+            OPCODE_HALT: self.executeHalt
+        }
 
-        # Set the default execution variables.
+        # Set the default execution variables. Inputs are taken from the queue
+        # first, then from the source, if any, and then from the pending ones.
         self.position = 0
-        self.inputs = []
-        self.outputs = []
+        self.inputs = deque()
+        self.inputSource = None
+        self.pendingInputs = deque()
+        self.setOutputSink([])
         self.relativeBase = 0
         self.pauseBeforeNextInput = False
         self.returnAfterInput = False
+        self.waitForInput = False
+
+        # Use the instructions through an image, shared with other programs when given.
+        self.setInstructions(instructions)
 
         # Set the default config variables.
         self.terminal = True
         self.numOutputsToReturn = math.inf
+        self.engine = defaultEngine
+        self.fusion = True
+        self.loopSummaries = True
+
+        # Number of places where instructions were fused, by kind of fusion.
+        self.fusions = {FUSION_COMPARE_JUMP: 0, FUSION_OFFSET_STORE: 0}
+
+        # Counters of the profiled engine, kept between executions.
+        self.profile = sharedProfile if sharedProfile != None else Profile()
+
+        # Recording of the inputs and outputs, only while recording.
+        self.recording = None
+
+        # Calls remembered by the memoized engine, by their entry and the cells they
+        # read. What a call read is checked before using it, so they are kept when
+        # the memory changes. For every entry, the calls that did inputs or outputs,
+        # that were made before and that were not, and the entries not followed.
+        self.calls = {}
+        self.rememberedCalls = 0
+        self.impureCalls = {}
+        self.repeatedCalls = {}
+        self.newCalls = {}
+        self.ignoredCalls = set()
     
     # Sets a value inside an address.
     def setMemory(self, address, value):
-        self.instructions[address] = value
+        self.store(address, value)
+    
+    # Starts adding every input consumed and every output sent to the recording.
+    # The program is executed with the profiled engine while recording, to know
+    # the instructions executed between them.
+    def record(self, recording):
+        recording.digest = self.image.digest()
+        recording.last = self.profile.instructions
+        self.recording = recording
+    
+    # Decide the engine used to execute the program.
+    def setEngine(self, engine):
+        self.engine = engine
+    
+    # Decide if the interpreter fuses common pairs of instructions. The instructions
+    # already decoded are decoded again.
+    def fuseInstructions(self, decision):
+        self.fusion = decision
+        self.decoded = {}
+    
+    # Decide if the fast engine executes at once the loops it can summarize.
+    def summarizeLoops(self, decision):
+        self.loopSummaries = decision
     
     # Sets a variable to pause execution right before the next input instruction.
     def pauseBeforeInputInstruction(self, decision):
@@ -67,20 +287,128 @@ class Program():
         self.returnAfterInput = False
         self.execute()
     
-    # The program receives a new set of instructions.
+    # The program receives a new set of instructions, as a list or as an image that
+    # is not copied. The program starts from them again every time it is reset.
     def setInstructions(self, instructions):
-        self.instructions = copyList(instructions)
-        self.length = len(self.instructions)
+        self.image = instructions if isinstance(instructions, ProgramImage) else ProgramImage(instructions)
+        self.useMemory(self.image.memory.copy())
+        self.fromImage = True
+    
+    # Brings the memory back to the instructions of the image and resets the execution
+    # state. Only the pages written since the image was used are restored, and only
+    # the code decoded or compiled from cells that differed from the image is
+    # forgotten, so it takes time for those and not for whole pages.
+    def reset(self):
+        if not self.fromImage:
+            # The memory comes from a snapshot, it cannot be compared with the image.
+            self.setInstructions(self.image)
+        else:
+            memory = self.instructions
+            image = self.image.memory
+            for address in self.changedDecoded:
+                self.decoded.pop(address, None)
+            for entry, cells in self.changedBlocks.items():
+                self.blocks.pop(entry, None)
+                for address in cells:
+                    entries = self.compiledCells.get(address, [])
+                    if entry in entries:
+                        entries.remove(entry)
+                        if len(entries) == 0:
+                            del self.compiledCells[address]
+            self.changedDecoded = set()
+            self.changedBlocks = {}
+            for number in memory.dirty:
+                if number < len(image.pages):
+                    memory.pages[number] = image.pages[number]
+            del memory.pages[len(image.pages):]
+            memory.farPages = dict(image.farPages)
+            memory.owned = set()
+            memory.dirty = set()
+            memory.size = image.size
+            memory.denseSize = image.denseSize
+
+        self.resetExecutionState()
+    
+    # Uses the given memory, forgetting the code decoded or compiled from the previous one.
+    def useMemory(self, memory):
+        self.instructions = memory
+        self.instructions.owner = self
+        self.fromImage = False
+
+        # Decoded instructions, indexed by the address of their opcode.
+        self.decoded = {}
+
+        # Compiled blocks indexed by their entry address, and for every address
+        # inside a block the entries of the blocks that use it.
+        self.blocks = {}
+        self.compiledCells = {}
+        self.volatileCells = set()
+
+        # Addresses decoded, and cells of the blocks compiled by their entry, from
+        # values that differ from the image or that are beyond it. Writes to decoded
+        # or compiled cells forget them, so the rest still match the image after a
+        # reset.
+        self.changedDecoded = set()
+        self.changedBlocks = {}
+
+        # Times the fast engine jumped back to every loop entry, or None for the
+        # loops that could not be summarized.
+        self.loops = {}
+    
+    # Captures the whole execution state of the program. The memory is shared with
+    # the program until one of them writes to it, page by page.
+    def snapshot(self):
+        return Snapshot(self)
+    
+    # Brings the program back to the state captured in a snapshot. The snapshot
+    # can be restored again later.
+    def restore(self, snapshot):
+        self.useMemory(snapshot.memory.copy())
+        self.position = snapshot.position
+        self.relativeBase = snapshot.relativeBase
+        self.inputs = deque(snapshot.inputs)
+        self.inputSource = None
+        if snapshot.inputSource != None:
+            self.inputSource, snapshot.inputSource = itertools.tee(snapshot.inputSource)
+        self.pendingInputs = deque(snapshot.pendingInputs)
+        self.emptyOutputs()
+        self.outputs.extend(snapshot.outputs)
+        self.pauseBeforeNextInput = snapshot.pauseBeforeNextInput
+        self.returnAfterInput = snapshot.returnAfterInput
+    
+    # Returns a new program in the same state and with the same config as this one,
+    # that can continue its execution independently.
+    def fork(self):
+        program = Program()
+        program.restore(self.snapshot())
+        program.terminal = self.terminal
+        program.numOutputsToReturn = self.numOutputsToReturn
+        program.engine = self.engine
+        program.fusion = self.fusion
+        program.loopSummaries = self.loopSummaries
+        program.image = self.image
+
+        return program
     
     # Returns a copy of the current instructions.
     def getInstructions(self):
-        return copyList(self.instructions)
+        return self.instructions.tolist()
+    
+    # Returns a read-only view of the memory, that follows its changes without
+    # copying it. Addresses not used read as 0, like in the program.
+    def memoryView(self):
+        return ReadOnlyView(self.instructions)
+    
+    # Number of memory addresses used by the program so far.
+    @property
+    def length(self):
+        return self.instructions.size
     
     # Resets all the relevant variables for the execution.
     def resetExecutionState(self):
         self.position = 0
-        self.inputs = []
-        self.outputs = []
+        self.setInputs([])
+        self.emptyOutputs()
         self.relativeBase = 0
         self.pauseBeforeNextInput = False
         self.returnAfterInput = False
@@ -109,44 +437,185 @@ class Program():
     def returnOnOutputNumber(self, number):
         self.numOutputsToReturn = number
     
-    # Receives a list of integer inputs and stores them for later use
-    # on input instructions.
+    # Receives the integer inputs for later use on input instructions. A list is
+    # copied, a deque is used as it is so more inputs can be added to it later, and
+    # any other iterable, like a generator, is consumed one input at a time.
     def setInputs(self, input):
-        self.inputs = copyList(input)
+        self.inputSource = None
+        self.pendingInputs = deque()
+        if isinstance(input, deque):
+            self.inputs = input
+        elif isinstance(input, (list, tuple)):
+            self.inputs = deque(input)
+        else:
+            self.inputs = deque()
+            self.inputSource = iter(input)
+    
+    # Receives the inputs as ASCII text, a string or bytes, that is given to the
+    # program one character code at a time.
+    def setAsciiInputs(self, text):
+        self.setInputs(iter(text.encode('ascii') if isinstance(text, str) else text))
+    
+    # Adds ASCII text, a string or bytes, to the existing inputs.
+    def appendAsciiInputs(self, text):
+        self.appendToInputs(text.encode('ascii') if isinstance(text, str) else text)
     
-    # Adds to the existing inputs. values parameter has to be a list.
+    # Adds to the existing inputs. values parameter can be any iterable. While
+    # there is a source the values wait until it runs out.
     def appendToInputs(self, values):
-        for value in values:
-            self.inputs.append(value)
+        if self.inputSource != None:
+            self.pendingInputs.extend(values)
+        else:
+            self.inputs.extend(values)
+    
+    # Returns the next input, or None if there are no inputs left.
+    def nextInput(self):
+        if len(self.inputs) > 0:
+            return self.inputs.popleft()
+        elif self.inputSource != None:
+            number = next(self.inputSource, None)
+            if number != None:
+                return number
+
+            # The source ran out, so the pending inputs are next.
+            self.inputSource = None
+            self.inputs, self.pendingInputs = self.pendingInputs, deque()
+            if len(self.inputs) > 0:
+                return self.inputs.popleft()
+
+        return None
+    
+    # Decide where the outputs go. The sink can be a list or a deque, bounded or
+    # not, that keeps them, or a function that is called with every output.
+    def setOutputSink(self, sink):
+        if callable(sink):
+            self.outputs = []
+            self.sendOutput = sink
+        else:
+            self.outputs = sink
+            self.sendOutput = sink.append
     
     # Returns a copy of the outputs generated by the program.
     def getOutputs(self):
         return copyList(self.outputs)
     
+    # Returns a read-only view of the outputs kept by the output sink, that follows
+    # them without copying them until a new sink is set.
+    def outputsView(self):
+        return ReadOnlyView(self.outputs)
+    
+    # Returns the outputs after the first ones, given by a cursor that is the number
+    # of outputs already seen. Only the new outputs are copied, so polling a program
+    # that keeps adding outputs does not copy all of them every time.
+    def outputsSince(self, cursor):
+        if isinstance(self.outputs, list):
+            return self.outputs[cursor:]
+
+        return list(itertools.islice(self.outputs, cursor, None))
+    
     def emptyOutputs(self):
-        self.outputs = []
+        self.outputs.clear()
+    
+    # Returns the outputs as ASCII text, with the runs of character codes joined in
+    # strings and the outputs that are not characters as numbers.
+    def getAsciiOutputs(self):
+        return decodeAscii(self.outputs)
+    
+    # Executes the program and yields its outputs as ASCII text, line by line and
+    # without the line breaks, and the outputs that are not characters as numbers.
+    # A number ends the line before it. The outputs are decoded in chunks, so lines
+    # come as soon as a chunk is full or the program stops. Returns the finish code
+    # when the program stops for any other reason than a chunk of outputs. The
+    # output sink and the number of outputs to return are restored afterwards.
+    def asciiStream(self):
+        outputs = self.outputs
+        sendOutput = self.sendOutput
+        numOutputsToReturn = self.numOutputsToReturn
+        chunk = deque()
+        self.setOutputSink(chunk)
+        line = ''
+        try:
+            while True:
+                self.returnOnOutputNumber(ASCII_CHUNK_SIZE)
+                result = self.execute()
+                for item in decodeAscii(chunk):
+                    if not isinstance(item, str):
+                        if line != '':
+                            yield line
+                            line = ''
+                        yield item
+                        continue
+                    lines = (line + item).split('\n')
+                    for complete in lines[:-1]:
+                        yield complete
+                    line = lines[-1]
+                chunk.clear()
+                if result != FINISH_OUTPUT:
+                    if line != '':
+                        yield line
+                    return result
+        finally:
+            self.outputs = outputs
+            self.sendOutput = sendOutput
+            self.numOutputsToReturn = numOutputsToReturn
+    
+    # Executes the program and yields every output as soon as it is generated.
+    # Returns the finish code when the program stops for any other reason. The
+    # output sink and the number of outputs to return are restored afterwards.
+    def outputStream(self):
+        outputs = self.outputs
+        sendOutput = self.sendOutput
+        numOutputsToReturn = self.numOutputsToReturn
+        pending = deque()
+        self.setOutputSink(pending)
+        try:
+            while True:
+                self.returnOnFirstOutput(True)
+                result = self.execute()
+                while len(pending) > 0:
+                    yield pending.popleft()
+                if result != FINISH_OUTPUT:
+                    return result
+        finally:
+            self.outputs = outputs
+            self.sendOutput = sendOutput
+            self.numOutputsToReturn = numOutputsToReturn
     
-    # Receives a number that represents an address. If there is no memory yet at
-    # that address, fill the existing instructions until that address with zeros.
+    # Receives a number that represents an address and makes sure the memory
+    # of the program reaches that address.
     def check(self, number):
-        if number >= len(self.instructions):
-            for i in range(number - len(self.instructions) + 1):
-                self.instructions.append(0)
-        
-        self.length = len(self.instructions)
+        self.instructions.touch(number)
         return number
     
     # The place to store a value depends if the address is given in positional
-    # or relative mode.
+    # or relative mode. Nothing is stored in value mode, and all the engines store
+    # their results the same way.
     def storeAt(self, address, modeIndex, value):
         # First decide if we have to store the value in position or relative mode.
-        mode = self.opcode.modes[modeIndex] if len(self.opcode.modes) >= modeIndex + 1 else PARAM_MODE_POSITION
+        mode = self.opcode.modes[modeIndex]
+        if mode == PARAM_MODE_RELATIVE:
+            address += self.relativeBase
+        elif mode != PARAM_MODE_POSITION:
+            return
 
-        # Store the value according to the mode.
-        if mode == PARAM_MODE_POSITION:
-            self.instructions[self.check(address)] = value
-        elif mode == PARAM_MODE_RELATIVE:
-            self.instructions[self.check(address + self.relativeBase)] = value
+        self.store(address, value)
+    
+    # Stores a value at an address and forgets any code decoded or compiled that
+    # uses it. Returns True if a compiled block had to be dropped.
+    def store(self, address, value):
+        self.instructions.write(address, value)
+        if address in self.decoded:
+            del self.decoded[address]
+        if address in self.compiledCells:
+            for entry in self.compiledCells.pop(address):
+                self.blocks.pop(entry, None)
+
+            # Programs that write over compiled code usually keep doing it, so the
+            # parameters at this address are read at run time from now on.
+            self.volatileCells.add(address)
+            return True
+
+        return False
     
     # Receives a starting position in memory and a number of parameters, and returns a list
     # with the values of those parameters.
@@ -154,69 +623,859 @@ class Program():
         values = []
 
         # Try to give a value to all parameters requested.
+        memory = self.instructions
+        modes = self.opcode.modes
         for i in range(number):
-            if i < len(self.opcode.modes):
-                # This parameter has a mode associated with it.
-                if self.opcode.modes[i] == PARAM_MODE_POSITION:
-                    value = self.instructions[self.check(self.instructions[self.check(start + i)])]
-                elif self.opcode.modes[i] == PARAM_MODE_VALUE:
-                    value = self.instructions[start + i]
-                elif self.opcode.modes[i] == PARAM_MODE_RELATIVE:
-                    value = self.instructions[self.check(self.instructions[self.check(start + i)]  + self.relativeBase)]
-            else:
-                # No mode has been supplied, the default is position mode.
-                value = self.instructions[self.check(self.instructions[self.check(start + i)])]
+            if modes[i] == PARAM_MODE_POSITION:
+                value = memory.read(memory.read(start + i))
+            elif modes[i] == PARAM_MODE_VALUE:
+                value = memory.read(start + i)
+            elif modes[i] == PARAM_MODE_RELATIVE:
+                value = memory.read(memory.read(start + i) + self.relativeBase)
             values.append(value)
 
         return values
     
+    # Executes the program as an asyncio task until it halts. Inputs already given
+    # are consumed inline, and only when there are none left the program awaits
+    # the next one from the input queue, the only moment it gives way to other
+    # tasks. While running, outputs go to the output queue, that must not be
+    # bounded, instead of the output sink. Returns the finish code.
+    async def run(self, inputQueue, outputQueue):
+        # Keep the config that is changed while running.
+        outputs = self.outputs
+        sendOutput = self.sendOutput
+        numOutputsToReturn = self.numOutputsToReturn
+        self.sendOutput = outputQueue.put_nowait
+        self.numOutputsToReturn = math.inf
+        self.waitForInput = True
+        try:
+            while True:
+                result = self.execute()
+                if result != FINISH_WAIT_INPUT:
+                    return result
+                self.inputs.append(await inputQueue.get())
+        finally:
+            self.outputs = outputs
+            self.sendOutput = sendOutput
+            self.numOutputsToReturn = numOutputsToReturn
+            self.waitForInput = False
+    
+    # Decodes the instruction at the given address and keeps it in the cache
+    # of decoded instructions until something writes over its opcode.
+    def decode(self, address):
+        value = self.instructions.read(address)
+        opcode = Opcode(value)
+        opcode.handler = opcode.plainHandler = self.handlers.get(opcode.opcode, self.executeUnknown)
+        self.decoded[address] = opcode
+        if address >= self.image.memory.size or value != self.image.memory.peek(address):
+            self.changedDecoded.add(address)
+        if self.fusion:
+            self.fuse(address, opcode)
+
+        return opcode
+    
+    # Makes an instruction also execute the next one when they are a common pair:
+    # a comparison followed by a jump on its result, or a relative base offset
+    # followed by an instruction storing a value. Both instructions are executed
+    # as before, writes included, but with a single dispatch. The next instruction
+    # is decoded here, and the pair is only executed together while it stays the
+    # same, so writing over it also breaks the fusion.
+    def fuse(self, address, opcode):
+        memory = self.instructions
+        if opcode.opcode in [OPCODE_LESS_THAN, OPCODE_EQUALS] and opcode.modes[2] == PARAM_MODE_POSITION:
+            following = memory.peek(address + 4)
+            if address + 4 >= memory.size or not following % 100 in [OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE]:
+                return
+            following = self.decoded.get(address + 4) or self.decode(address + 4)
+            if following.modes[0] == PARAM_MODE_POSITION and following.modes[1] <= PARAM_MODE_RELATIVE and memory.peek(address + 3) == memory.peek(address + 5):
+                opcode.next = following
+                opcode.handler = self.executeCompareAndJump
+                self.fusions[FUSION_COMPARE_JUMP] += 1
+        elif opcode.opcode == OPCODE_RELBASE_OFFSET:
+            following = memory.peek(address + 2)
+            if address + 2 >= memory.size or not following % 100 in STORE_OPCODES:
+                return
+            opcode.next = self.decoded.get(address + 2) or self.decode(address + 2)
+            opcode.handler = self.executeOffsetAndStore
+            self.fusions[FUSION_OFFSET_STORE] += 1
+
     # Executes the instructions of this program with the current settings.
     def execute(self):
-        while self.position < self.length:
-
-            # Parse the next opcode.
-            self.opcode = Opcode(self.instructions[self.check(self.position)])
-
-            # Execute the appropriate operation.
-            if self.opcode.opcode == OPCODE_SUM:
-                self.executeSum()
-            elif self.opcode.opcode == OPCODE_MULTIPLY:
-                self.executeMultiplication()
-            elif self.opcode.opcode == OPCODE_INPUT:
-                if self.pauseBeforeNextInput:
-                    return FINISH_PAUSE_INPUT
-                self.executeInput()
-                if self.returnAfterInput:
-                    self.returnAfterInput = False
-                    return FINISH_AFTER_INPUT
-            elif self.opcode.opcode == OPCODE_OUTPUT:
-                self.executeOutput()
-                if self.numOutputsToReturn == 0:
-                    return FINISH_OUTPUT
-            elif self.opcode.opcode == OPCODE_JUMP_IF_TRUE:
-                self.executeJumpIfTrue()
-            elif self.opcode.opcode == OPCODE_JUMP_IF_FALSE:
-                self.executeJumpIfFalse()
-            elif self.opcode.opcode == OPCODE_LESS_THAN:
-                self.executeLessThan()
-            elif self.opcode.opcode == OPCODE_EQUALS:
-                self.executeEquals()
-            elif self.opcode.opcode == OPCODE_RELBASE_OFFSET:
-                self.executeRelativeBaseOffset()
-            elif self.opcode.opcode == OPCODE_HALT:
-                return FINISH_HALT
+        if self.recording != None:
+            return self.executeRecorded()
+        elif self.engine == ENGINE_COMPILED:
+            return self.executeCompiled()
+        elif self.engine == ENGINE_PROFILED:
+            return self.executeProfiled()
+        elif self.engine == ENGINE_FAST:
+            return self.executeFast()
+        elif self.engine == ENGINE_MEMOIZED:
+            return self.executeMemoized()
+
+        return self.interpret()
+
+    # Executes the program with the reference interpreter.
+    def interpret(self):
+        while self.position < self.instructions.size:
+
+            # Get the next opcode, decoding it only the first time it is seen.
+            self.opcode = self.decoded.get(self.position)
+            if self.opcode == None:
+                self.opcode = self.decode(self.position)
+
+            # Execute the appropriate operation. Handlers return a finish code only
+            # when the execution has to stop.
+            result = self.opcode.handler()
+            if result != None:
+                return result
+    
+        return FINISH_ERROR
+    
+    # Executes the program with the interpreter, counting every instruction by
+    # opcode and by address, and the time spent running and waiting for inputs.
+    def executeProfiled(self):
+        profile = self.profile
+        opcodes = profile.opcodes
+        addresses = profile.addresses
+        start = time.perf_counter()
+
+        # Time since the last execution paused to wait for an input.
+        if profile.waitStart != None:
+            profile.inputTime += start - profile.waitStart
+            profile.waitStart = None
+
+        result = FINISH_ERROR
+        while self.position < self.instructions.size:
+            position = self.position
+            self.opcode = self.decoded.get(position)
+            if self.opcode == None:
+                self.opcode = self.decode(position)
+
+            # Inputs may block reading them from the terminal.
+            # Fused instructions are executed one by one so all of them are counted.
+            if self.opcode.opcode == OPCODE_INPUT:
+                inputStart = time.perf_counter()
+                result = self.opcode.plainHandler()
+                profile.inputTime += time.perf_counter() - inputStart
             else:
-                print('ERROR: opcode {} not recognised by the computer'.format(self.instructions[self.position]))
-                return FINISH_ERROR
+                result = self.opcode.plainHandler()
+
+            # Inputs that paused the execution are counted when they are executed.
+            if result != FINISH_PAUSE_INPUT and result != FINISH_WAIT_INPUT:
+                opcodes[self.opcode.opcode] = opcodes.get(self.opcode.opcode, 0) + 1
+                addresses[position] = addresses.get(position, 0) + 1
+            if result != None:
+                break
+
+        profile.totalTime += time.perf_counter() - start
+        if result == FINISH_PAUSE_INPUT or result == FINISH_WAIT_INPUT:
+            profile.waitStart = time.perf_counter()
+
+        return result
     
+    # Executes the program in a single loop that keeps the position, the relative
+    # base and the memory in local variables, and reads the modes of every opcode
+    # from a table. Parameters are read straight from the pages in use, and only
+    # far addresses and writes to shared pages or to decoded code go through the
+    # memory and the program. Inputs, instructions near the end of the memory and
+    # opcodes that are not in the table are executed by the interpreter. Loops that
+    # keep jumping back are summarized when possible.
+    def executeFast(self):
+        table = fastOpcodes if fastOpcodes != None else buildFastOpcodes()
+        limited = self.numOutputsToReturn != math.inf
+        summarize = self.loopSummaries
+        loops = self.loops
+        position = self.position
+        rb = self.relativeBase
+
+        while True:
+            # Inputs, outputs and the interpreter may change the program or its
+            # memory, so the local variables are taken again after them.
+            memory = self.instructions
+            pages = memory.pages
+            owned = memory.owned
+            denseSize = memory.denseSize
+            read = memory.read
+            write = memory.write
+            store = self.store
+            decoded = self.decoded
+            compiledCells = self.compiledCells
+
+            while True:
+                entry = None
+                if 0 <= position and position + 3 < denseSize:
+                    entry = table.get(pages[position >> PAGE_SHIFT][position & PAGE_MASK])
+                if entry == None:
+                    break
+
+                opcode, mode1, mode2, mode3 = entry
+                if opcode == OPCODE_HALT:
+                    self.position = position
+                    self.relativeBase = rb
+                    return FINISH_HALT
+
+                # First parameter.
+                address = position + 1
+                cell = pages[address >> PAGE_SHIFT][address & PAGE_MASK]
+                if mode1 == PARAM_MODE_VALUE:
+                    first = cell
+                else:
+                    if mode1 == PARAM_MODE_RELATIVE:
+                        cell += rb
+                    first = pages[cell >> PAGE_SHIFT][cell & PAGE_MASK] if 0 <= cell < denseSize else read(cell)
+
+                if opcode == OPCODE_RELBASE_OFFSET:
+                    rb += first
+                    position += 2
+                    continue
+                elif opcode == OPCODE_OUTPUT:
+                    position += 2
+                    self.sendOutput(first)
+                    if self.terminal:
+                        print('Output: {}'.format(first))
+                    if limited:
+                        self.numOutputsToReturn -= 1
+                        if self.numOutputsToReturn == 0:
+                            self.position = position
+                            self.relativeBase = rb
+                            return FINISH_OUTPUT
+                    break
+
+                # Second parameter.
+                address += 1
+                cell = pages[address >> PAGE_SHIFT][address & PAGE_MASK]
+                if mode2 == PARAM_MODE_VALUE:
+                    second = cell
+                else:
+                    if mode2 == PARAM_MODE_RELATIVE:
+                        cell += rb
+                    second = pages[cell >> PAGE_SHIFT][cell & PAGE_MASK] if 0 <= cell < denseSize else read(cell)
+
+                if opcode == OPCODE_JUMP_IF_TRUE or opcode == OPCODE_JUMP_IF_FALSE:
+                    if (first != 0) != (opcode == OPCODE_JUMP_IF_TRUE):
+                        position += 3
+                        continue
+
+                    # Jumping back closes a loop, that is summarized once it is hot.
+                    if second <= position and summarize:
+                        hits = loops.get(second, 0)
+                        if hits == None:
+                            pass
+                        elif hits < LOOP_THRESHOLD:
+                            loops[second] = hits + 1
+                        else:
+                            end = self.summarizeLoop(second, position, rb)
+                            if end == None:
+                                loops[second] = None
+                            else:
+                                position = end
+                                continue
+                    position = second
+                    continue
+
+                if opcode == OPCODE_SUM:
+                    value = first + second
+                elif opcode == OPCODE_MULTIPLY:
+                    value = first * second
+                elif opcode == OPCODE_LESS_THAN:
+                    value = 1 if first < second else 0
+                else:
+                    value = 1 if first == second else 0
+                position += 4
+
+                # Store the result as storeAt does.
+                if mode3 == PARAM_MODE_VALUE:
+                    continue
+                address += 1
+                cell = pages[address >> PAGE_SHIFT][address & PAGE_MASK]
+                if mode3 == PARAM_MODE_RELATIVE:
+                    cell += rb
+                if cell in decoded or cell in compiledCells:
+                    store(cell, value)
+                elif 0 <= cell < denseSize and cell >> PAGE_SHIFT in owned:
+                    try:
+                        pages[cell >> PAGE_SHIFT][cell & PAGE_MASK] = value
+                    except (OverflowError, TypeError):
+                        write(cell, value)
+                else:
+                    write(cell, value)
+                    denseSize = memory.denseSize
+
+            # Outputs were already executed, the rest go to the interpreter.
+            if entry != None:
+                continue
+            if position >= memory.size:
+                break
+            self.position = position
+            self.relativeBase = rb
+            self.opcode = decoded.get(position) or self.decode(position)
+            result = self.opcode.plainHandler()
+            position = self.position
+            rb = self.relativeBase
+            if result != None:
+                return result
+
+        self.position = position
+        self.relativeBase = rb
         return FINISH_ERROR
     
+    # Executes at once the remaining iterations of the loop from the entry to the
+    # jump back at the given address. The loop can only have arithmetic and
+    # comparisons between a jump out of it at the start, or the jump back at the
+    # end, and its cells can only be counters that change by the same step every
+    # iteration, sums of them, values that depend only on them, and stores to
+    # addresses held by counters, like the ones of programs filling memory. The
+    # number of iterations and the final values are found without executing them.
+    # Returns the position after the loop, or None without changing anything if the
+    # loop cannot be summarized.
+    def summarizeLoop(self, entry, jump, rb):
+        memory = self.instructions
+        instructions = []
+        position = entry
+        while position <= jump and len(instructions) < LOOP_LIMIT:
+            opcode = Opcode(memory.peek(position))
+            if max(opcode.modes, default=0) > PARAM_MODE_RELATIVE or position + opcode.length > memory.size:
+                return None
+            instructions.append((position, opcode))
+            position += opcode.length
+        if position != jump + 3 or instructions[-1][0] != jump:
+            return None
+
+        # The jump out is the first instruction if that one jumps, otherwise it is
+        # the jump back.
+        jumps = [OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE]
+        exitAtStart = len(instructions) > 2 and instructions[0][1].opcode in jumps
+        body = instructions[1:-1] if exitAtStart else instructions[:-1]
+        if any(not opcode.opcode in STORE_OPCODES for position, opcode in body):
+            return None
+
+        try:
+            # Run an iteration with the values of the cells written by the loop as
+            # unknowns, until the cells written are known.
+            written = set()
+            for attempt in range(4):
+                state = {}
+                reads = set()
+                stores = []
+
+                def read(address):
+                    if address in state:
+                        return state[address]
+                    if address in written:
+                        return Linear(0, {address: 1})
+                    if not 0 <= address < memory.size:
+                        raise LoopError()
+                    reads.add(address)
+                    return Linear(memory.peek(address))
+
+                def parameter(position, index, mode):
+                    value = read(position + index + 1)
+                    if mode == PARAM_MODE_VALUE:
+                        return value
+                    value = linear(value).add(Linear(rb if mode == PARAM_MODE_RELATIVE else 0))
+                    if len(value.terms) > 0:
+                        raise LoopError()
+                    return read(value.constant)
+
+                if exitAtStart:
+                    position, opcode = instructions[0]
+                    condition = parameter(position, 0, opcode.modes[0])
+                    target = linear(parameter(position, 1, opcode.modes[1]))
+
+                for position, opcode in body:
+                    first = parameter(position, 0, opcode.modes[0])
+                    second = parameter(position, 1, opcode.modes[1])
+                    if opcode.opcode == OPCODE_SUM:
+                        value = linear(first).add(linear(second))
+                    elif opcode.opcode == OPCODE_MULTIPLY:
+                        first = linear(first)
+                        second = linear(second)
+                        if len(first.terms) == 0:
+                            value = second.scale(first.constant)
+                        elif len(second.terms) == 0:
+                            value = first.scale(second.constant)
+                        else:
+                            raise LoopError()
+                    else:
+                        value = Comparison(opcode.opcode, linear(first), linear(second))
+                    if opcode.modes[2] == PARAM_MODE_VALUE:
+                        continue
+
+                    address = linear(read(position + 3)).add(Linear(rb if opcode.modes[2] == PARAM_MODE_RELATIVE else 0))
+                    if len(address.terms) > 0:
+                        stores.append((address, value))
+                    elif address.constant < 0:
+                        raise LoopError()
+                    else:
+                        state[address.constant] = value
+
+                position, opcode = instructions[-1]
+                back = parameter(position, 0, opcode.modes[0])
+                if linear(parameter(position, 1, opcode.modes[1])).evaluate({}) != entry:
+                    raise LoopError()
+                if set(state) == written:
+                    break
+                written = set(state)
+            else:
+                return None
+
+            # Instructions that change must be executed one by one.
+            if any(position in written for position, opcode in instructions):
+                return None
+
+            # Counters only add their step to themselves, sums only add values that
+            # depend on counters to themselves, and nothing else may depend on the
+            # values of the previous iteration of anything but counters.
+            steps = {}
+            for cell, value in state.items():
+                if isinstance(value, Linear) and value.terms == {cell: 1}:
+                    steps[cell] = value.constant
+            increments = {}
+            for cell, value in state.items():
+                if not cell in steps and isinstance(value, Linear) and value.terms.get(cell) == 1:
+                    increments[cell] = Linear(value.constant, {other: factor for other, factor in value.terms.items() if other != cell})
+            values = [value for cell, value in state.items() if not cell in increments] + list(increments.values())
+            values += [value for store in stores for value in store]
+            if exitAtStart:
+                # Testing a cell that is not a counter tests what the previous
+                # iteration wrote to it.
+                tested = next(iter(condition.terms)) if len(condition.terms) == 1 else None
+                if not tested in state or tested in steps or tested in increments or condition.terms[tested] != 1 or condition.constant != 0:
+                    tested = None
+                    values.append(condition)
+                values.append(target)
+            else:
+                values.append(back)
+            if any(not set(value.symbols()) <= set(steps) for value in values):
+                return None
+
+            # Counters start where they are now, and every iteration adds their step.
+            start = {cell: memory.peek(cell) for cell in steps}
+            def evaluate(value, iteration):
+                return value.evaluate({cell: start[cell] + step * iteration for cell, step in steps.items()})
+
+            # Find the number of iterations executed, from the first one taking the exit.
+            if exitAtStart:
+                exitWhenZero = instructions[0][1].opcode == OPCODE_JUMP_IF_FALSE
+                if tested != None:
+                    if (memory.peek(tested) == 0) == exitWhenZero:
+                        iterations = 0
+                    else:
+                        iterations = firstExit(state[tested], exitWhenZero, evaluate)
+                        iterations = iterations + 1 if iterations != None else None
+                else:
+                    iterations = firstExit(condition, exitWhenZero, evaluate)
+                if len(target.terms) > 0:
+                    return None
+                end = target.constant
+            else:
+                backWhenZero = instructions[-1][1].opcode == OPCODE_JUMP_IF_FALSE
+                iterations = firstExit(back, not backWhenZero, evaluate)
+                iterations = iterations + 1 if iterations != None else None
+                end = jump + 3
+            if exitAtStart and (len(back.symbols()) > 0 or (back.evaluate({}) == 0) != (instructions[-1][1].opcode == OPCODE_JUMP_IF_FALSE)):
+                return None
+        except LoopError:
+            return None
+        if iterations == None:
+            return None
+
+        # Stores to moving addresses cannot reach the loop nor the cells it reads or writes.
+        cells = reads | written | set(range(entry, jump + 3))
+        for address, value in stores:
+            first = evaluate(address, 0)
+            step = evaluate(address, 1) - first
+            last = first + step * (iterations - 1)
+            if iterations > 0 and min(first, last) < 0:
+                return None
+            for cell in cells:
+                if step == 0:
+                    hit = iterations > 0 and cell == first
+                else:
+                    hit = (cell - first) % step == 0 and 0 <= (cell - first) // step < iterations
+                if hit:
+                    return None
+
+        # Write the values left by the last iteration.
+        if iterations > 0:
+            for cell, value in state.items():
+                if cell in steps:
+                    result = start[cell] + steps[cell] * iterations
+                elif cell in increments:
+                    first = evaluate(increments[cell], 0)
+                    step = evaluate(increments[cell], 1) - first
+                    result = memory.peek(cell) + first * iterations + step * (iterations * (iterations - 1) // 2)
+                else:
+                    result = evaluate(value, iterations - 1)
+                self.store(cell, result)
+
+            # Stores to moving addresses are written in order, as the first address
+            # and value and their steps, and only the ones over code go through the program.
+            progressions = []
+            for address, value in stores:
+                first = evaluate(address, 0)
+                initial = evaluate(value, 0) if isinstance(value, Linear) else None
+                progressions.append((first, evaluate(address, 1) - first, initial, evaluate(value, 1) - initial if initial != None else value))
+            write = memory.write
+            decoded = self.decoded
+            compiledCells = self.compiledCells
+            for iteration in range(iterations):
+                for first, step, initial, change in progressions:
+                    address = first + step * iteration
+                    value = initial + change * iteration if initial != None else evaluate(change, iteration)
+                    if address in decoded or address in compiledCells:
+                        self.store(address, value)
+                    else:
+                        write(address, value)
+
+        # Summarizing short loops costs more than executing them, so loops that
+        # do not run long enough are executed one instruction at a time from now on.
+        if iterations < LOOP_THRESHOLD:
+            self.loops[entry] = None
+
+        return end
+    
+    # Executes the program like the interpreter, following the calls it makes to
+    # remember what they read and write, so a call made again with the same values
+    # in the cells read is skipped, writing what it wrote. A call is a jump taken
+    # with the address after the jump saved at the relative base, and it returns
+    # when the execution reaches that address with the same relative base. Cells
+    # read in relative mode are remembered from the relative base, so a call made
+    # deeper in the stack is also skipped. Calls that do inputs or outputs, that
+    # go through the interpreter, are never remembered.
+    def executeMemoized(self):
+        memory = self.instructions
+        read = memory.read
+        opcodes = {}
+        traces = []
+        trace = None
+        position = self.position
+        rb = self.relativeBase
+
+        def parameter(address, mode):
+            cell = read(address)
+            if trace != None:
+                trace.read(address, cell, False)
+            if mode == PARAM_MODE_VALUE:
+                return cell
+            if mode == PARAM_MODE_RELATIVE:
+                cell += rb
+            value = read(cell)
+            if trace != None:
+                trace.read(cell, value, mode == PARAM_MODE_RELATIVE)
+            return value
+
+        while position < memory.size:
+            value = read(position)
+            if trace != None:
+                trace.read(position, value, False)
+            opcode = opcodes.get(value)
+            if opcode == None:
+                opcode = opcodes[value] = Opcode(value)
+
+            if not opcode.opcode in MEMOIZED_OPCODES or max(opcode.modes) > PARAM_MODE_RELATIVE:
+                # The calls in progress cannot be remembered.
+                for active in traces:
+                    self.impureCalls[active.entry] = self.impureCalls.get(active.entry, 0) + 1
+                    if self.impureCalls[active.entry] >= CALL_IMPURE_LIMIT:
+                        self.ignoredCalls.add(active.entry)
+                traces = []
+                trace = None
+
+                self.position = position
+                self.relativeBase = rb
+                self.opcode = self.decoded.get(position) or self.decode(position)
+                result = self.opcode.plainHandler()
+                position = self.position
+                rb = self.relativeBase
+                if result != None:
+                    return result
+                continue
+
+            first = parameter(position + 1, opcode.modes[0])
+            if opcode.opcode == OPCODE_RELBASE_OFFSET:
+                rb += first
+                position += 2
+                continue
+
+            second = parameter(position + 2, opcode.modes[1])
+            if opcode.opcode == OPCODE_JUMP_IF_TRUE or opcode.opcode == OPCODE_JUMP_IF_FALSE:
+                if (first != 0) != (opcode.opcode == OPCODE_JUMP_IF_TRUE):
+                    position += 3
+                    continue
+
+                # Returning from the call in progress.
+                if trace != None and second == trace.end and rb == trace.base:
+                    finished = traces.pop()
+                    trace = traces[-1] if len(traces) > 0 else None
+                    self.rememberCall(finished)
+                    if trace != None:
+                        trace.merge(finished.reads, finished.writes, finished.relative, finished.absolute)
+
+                # Making a call, skipped if it was made before with the same values.
+                if 0 <= rb < memory.size and memory.peek(rb) == position + 3 and not second in self.ignoredCalls:
+                    end = self.repeatCall(second, rb, trace)
+                    if end != None:
+                        position = end
+                        continue
+                    trace = CallTrace(second, rb, position + 3)
+                    traces.append(trace)
+                    if len(traces) > CALL_DEPTH_LIMIT:
+                        del traces[0]
+                position = second
+                continue
+
+            if opcode.opcode == OPCODE_SUM:
+                value = first + second
+            elif opcode.opcode == OPCODE_MULTIPLY:
+                value = first * second
+            elif opcode.opcode == OPCODE_LESS_THAN:
+                value = 1 if first < second else 0
+            else:
+                value = 1 if first == second else 0
+
+            # Store the result as storeAt does.
+            mode = opcode.modes[2]
+            if mode != PARAM_MODE_VALUE:
+                address = read(position + 3)
+                if trace != None:
+                    trace.read(position + 3, address, False)
+                if mode == PARAM_MODE_RELATIVE:
+                    address += rb
+                self.store(address, value)
+                if trace != None:
+                    trace.write(address, value, mode == PARAM_MODE_RELATIVE)
+            position += 4
+
+        self.position = position
+        self.relativeBase = rb
+        return FINISH_ERROR
+    
+    # Remembers what a call that returned read and wrote.
+    def rememberCall(self, trace):
+        if self.rememberedCalls >= CALL_MEMORY_LIMIT:
+            return
+
+        # Cells read in both modes cannot be moved with the relative base.
+        movable = trace.relative.isdisjoint(trace.absolute)
+        cells = tuple((address - trace.base, True) if address in trace.relative else (address, False) for address in trace.reads)
+        shapes = self.calls.setdefault(trace.entry, {})
+        shape = (None if movable else trace.base, cells)
+        if not shape in shapes and len(shapes) >= CALL_SHAPE_LIMIT:
+            return
+        calls = shapes.setdefault(shape, {})
+        values = tuple(trace.reads.values())
+        if not values in calls:
+            calls[values] = RememberedCall(trace)
+            self.rememberedCalls += 1
+    
+    # Executes a call to the entry with the given relative base if it was made
+    # before with the same values in the cells it read, writing what it wrote and
+    # adding both to the call in progress, if any. Returns the position where the
+    # call returned, or None if it was not made before.
+    def repeatCall(self, entry, rb, trace):
+        memory = self.instructions
+        pages = memory.pages
+        denseSize = memory.denseSize
+        peek = memory.peek
+        for (base, cells), calls in self.calls.get(entry, {}).items():
+            if base != None and base != rb:
+                continue
+            addresses = [key + rb if relative else key for key, relative in cells]
+            if min(addresses, default=0) < 0:
+                continue
+            values = tuple(pages[address >> PAGE_SHIFT][address & PAGE_MASK] if address < denseSize else peek(address) for address in addresses)
+            call = calls.get(values)
+            if call == None or (rb != call.base and any(rb + offset in call.absolute for offset in call.relative)):
+                continue
+
+            # Reading beyond the memory used extends it, as in the call.
+            if len(addresses) > 0:
+                memory.touch(max(addresses))
+            writes = {key + rb if relative else key: value for key, relative, value in call.writes}
+            for address, value in writes.items():
+                self.store(address, value)
+            if trace != None:
+                trace.merge(dict(zip(addresses, values)), writes, [rb + offset for offset in call.relative], call.absolute)
+
+            self.repeatedCalls[entry] = self.repeatedCalls.get(entry, 0) + 1
+            return call.end
+
+        # Stop following calls that are rarely made again.
+        self.newCalls[entry] = self.newCalls.get(entry, 0) + 1
+        if self.newCalls[entry] >= CALL_MISS_LIMIT and self.repeatedCalls.get(entry, 0) * CALL_MISS_RATIO < self.newCalls[entry]:
+            self.ignoredCalls.add(entry)
+
+        return None
+    
+    # Executes the program with the profiled engine, adding the outputs to the
+    # recording on their way to the output sink. Inputs are added when executed.
+    def executeRecorded(self):
+        recording = self.recording
+        profile = self.profile
+        sendOutput = self.sendOutput
+        def recordOutput(value):
+            recording.add(EVENT_OUTPUT, profile.instructions, value)
+            sendOutput(value)
+
+        self.sendOutput = recordOutput
+        try:
+            recording.finish = self.executeProfiled()
+        finally:
+            self.sendOutput = sendOutput
+
+        return recording.finish
+    
+    # Executes the program running compiled blocks wherever possible, and the
+    # interpreter for the instructions that cannot be compiled.
+    def executeCompiled(self):
+        memory = self.instructions
+        blocks = self.blocks
+        arguments = (self, memory, memory.pages, memory.read, memory.write, self.store, self.compiledCells, self.decoded)
+        position = self.position
+        while position < memory.size:
+
+            # Run the block starting at this position, compiling it the first time.
+            block = blocks[position] if position in blocks else self.compileBlock(position)
+            if block != None:
+                position = block(*arguments)
+                continue
+
+            # Execute a single instruction with the interpreter.
+            self.position = position
+            self.opcode = self.decoded.get(position)
+            if self.opcode == None:
+                self.opcode = self.decode(position)
+            result = self.opcode.handler()
+            position = self.position
+            if result != None:
+                return result
+
+        self.position = position
+        return FINISH_ERROR
+    
+    # Returns the source code that reads a fixed address inside a compiled block.
+    def compileRead(self, address):
+        if 0 <= address < min(self.instructions.denseSize, self.image.memory.denseSize):
+            # The page can be accessed directly, the address is already in use, and
+            # still is after resetting the program to its image.
+            return 'pages[{}][{}]'.format(address >> PAGE_SHIFT, address & PAGE_MASK)
+
+        return 'read({})'.format(address)
+    
+    # Returns the source code of the address a parameter points to. Parameters
+    # stored in cells written by the program itself are read when the block runs.
+    def compileAddress(self, mode, cell, address):
+        target = self.compileRead(address) if address in self.volatileCells else str(cell)
+
+        return 'rb + ' + target if mode == PARAM_MODE_RELATIVE else target
+    
+    # Returns the source code that reads a parameter inside a compiled block.
+    def compileParameter(self, mode, cell, address):
+        if mode == PARAM_MODE_VALUE:
+            return self.compileAddress(mode, cell, address)
+        elif mode == PARAM_MODE_POSITION and not address in self.volatileCells:
+            return self.compileRead(cell)
+
+        # Addresses only known at run time read the page directly when it is in use.
+        target = self.compileAddress(mode, cell, address)
+        return '(pages[t >> {}][t & {}] if 0 <= (t := {}) < memory.denseSize else read(t))'.format(PAGE_SHIFT, PAGE_MASK, target)
+    
+    # Compiles the straight line of instructions starting at the entry address into
+    # a Python function with modes and addresses already resolved. The function
+    # returns the position of the next instruction. Returns None if the first
+    # instruction cannot be compiled.
+    def compileBlock(self, entry):
+        memory = self.instructions
+        lines = []
+        opcodes = []
+        position = entry
+        loop = False
+
+        while len(opcodes) < BLOCK_LIMIT:
+            opcode = Opcode(memory.peek(position))
+            if not opcode.opcode in COMPILED_OPCODES or max(opcode.modes) > PARAM_MODE_RELATIVE:
+                break
+            if position + opcode.length > memory.size:
+                break
+            cells = [memory.peek(position + i) for i in range(1, opcode.length)]
+            values = [self.compileParameter(opcode.modes[i], cells[i], position + i + 1) for i in range(len(cells))]
+            nextPosition = position + opcode.length
+            opcodes.append(position)
+
+            if opcode.opcode == OPCODE_RELBASE_OFFSET:
+                lines.append('rb += {}'.format(values[0]))
+            elif opcode.opcode in [OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE]:
+                # Both parameters are read before jumping, as the interpreter does.
+                lines.append('condition = ' + values[0])
+                lines.append('target = ' + values[1])
+                lines.append('if condition != 0:' if opcode.opcode == OPCODE_JUMP_IF_TRUE else 'if condition == 0:')
+
+                # Jumping back to the entry of the block loops without leaving it.
+                loop = opcode.modes[1] == PARAM_MODE_VALUE and cells[1] == entry and not position + 2 in self.volatileCells
+                if loop:
+                    lines.append('    continue')
+                else:
+                    lines.append('    program.relativeBase = rb')
+                    lines.append('    return target')
+                position = nextPosition
+                break
+            else:
+                if opcode.opcode == OPCODE_SUM:
+                    result = '{} + {}'.format(values[0], values[1])
+                elif opcode.opcode == OPCODE_MULTIPLY:
+                    result = '{} * {}'.format(values[0], values[1])
+                elif opcode.opcode == OPCODE_LESS_THAN:
+                    result = '1 if {} < {} else 0'.format(values[0], values[1])
+                else:
+                    result = '1 if {} == {} else 0'.format(values[0], values[1])
+                lines.append('value = ' + result)
+
+                # Store the result as storeAt does. Writing over code goes through the
+                # program, and the block is left if the store changed compiled code.
+                if opcode.modes[2] != PARAM_MODE_VALUE:
+                    lines.append('address = ' + self.compileAddress(opcode.modes[2], cells[2], position + 3))
+                    lines.append('if address in compiledCells or address in decoded:')
+                    lines.append('    if store(address, value):')
+                    lines.append('        program.relativeBase = rb')
+                    lines.append('        return {}'.format(nextPosition))
+                    lines.append('else:')
+                    lines.append('    write(address, value)')
+            position = nextPosition
+
+        # Remember the cells used by this block so writing over them drops it.
+        cells = [address for address in range(entry, max(position, entry + 1)) if address in opcodes or address == entry or not address in self.volatileCells]
+        for address in cells:
+            self.compiledCells.setdefault(address, []).append(entry)
+        image = self.image.memory
+        if any(address >= image.size or memory.peek(address) != image.peek(address) for address in cells):
+            self.changedBlocks[entry] = cells
+        if len(opcodes) == 0:
+            self.blocks[entry] = None
+            return None
+
+        # Build the source of the function and compile it if it is new.
+        lines.append('program.relativeBase = rb')
+        lines.append('return {}'.format(position))
+        if loop:
+            lines = ['while True:'] + ['    ' + line for line in lines]
+        source = 'def block(program, memory, pages, read, write, store, compiledCells, decoded):\n    rb = program.relativeBase\n'
+        source += ''.join('    ' + line + '\n' for line in lines)
+        if not source in compiledBlocks:
+            namespace = {}
+            exec(source, namespace)
+            compiledBlocks[source] = namespace['block']
+
+        self.blocks[entry] = compiledBlocks[source]
+        return self.blocks[entry]
+    
     def executeSum(self):
         # Parse the two parameters needed.
         values = self.parseParameters(self.position + 1, 2)
 
         # Store the result at the appropriate address.
-        self.storeAt(self.instructions[self.check(self.position + 3)], 2, values[0] + values[1])
+        self.storeAt(self.instructions.read(self.position + 3), 2, values[0] + values[1])
 
         # Update the position of the next instruction.
         self.position += 4
@@ -226,31 +1485,43 @@ class Program():
         values = self.parseParameters(self.position + 1, 2)
 
         # Store the result at the appropriate address.
-        self.storeAt(self.instructions[self.check(self.position + 3)], 2, values[0] * values[1])
+        self.storeAt(self.instructions.read(self.position + 3), 2, values[0] * values[1])
 
         # Jump four positions.
         self.position += 4
 
     def executeInput(self):
-        # Decide if the input was given, else ask for it from the command line.
-        if self.inputs != None and len(self.inputs) >= 1:
-            number = self.inputs[0]
-            del self.inputs[0]
-        else:
+        # Stop right before the input if requested.
+        if self.pauseBeforeNextInput:
+            return FINISH_PAUSE_INPUT
+
+        # Decide if the input was given, else wait for it or ask for it from the
+        # command line.
+        number = self.nextInput()
+        if number == None:
+            if self.waitForInput:
+                return FINISH_WAIT_INPUT
             number = input('Input: ')
+        if self.recording != None:
+            self.recording.add(EVENT_INPUT, self.profile.instructions, int(number))
 
         # Store it at the selected position.
-        self.storeAt(self.instructions[self.check(self.position + 1)], 0, int(number))
+        self.storeAt(self.instructions.read(self.position + 1), 0, int(number))
 
         # Update position.
         self.position += 2
+
+        # Return if only this input had to be executed.
+        if self.returnAfterInput:
+            self.returnAfterInput = False
+            return FINISH_AFTER_INPUT
     
     def executeOutput(self):
         # Find the value to output.
         values = self.parseParameters(self.position + 1, 1)
 
-        # Store the value in the output list.
-        self.outputs.append(values[0])
+        # Send the value to the output sink.
+        self.sendOutput(values[0])
 
         # Print to the terminal if requested.
         if self.terminal:
@@ -262,6 +1533,10 @@ class Program():
         # Update the position.
         self.position += 2
 
+        # Return if the requested number of outputs has been reached.
+        if self.numOutputsToReturn == 0:
+            return FINISH_OUTPUT
+
     def executeJumpIfTrue(self):
         values = self.parseParameters(self.position + 1, 2)
 
@@ -276,7 +1551,7 @@ class Program():
         values = self.parseParameters(self.position + 1, 2)
 
         # Store a 1 if less than, else store a 0.
-        self.storeAt(self.instructions[self.check(self.position + 3)], 2, 1 if values[0] < values[1] else 0)
+        self.storeAt(self.instructions.read(self.position + 3), 2, 1 if values[0] < values[1] else 0)
 
         self.position += 4
     
@@ -284,7 +1559,7 @@ class Program():
         values = self.parseParameters(self.position + 1, 2)
 
         # Store a 1 if equals, else store a 0.
-        self.storeAt(self.instructions[self.check(self.position + 3)], 2, 1 if values[0] == values[1] else 0)
+        self.storeAt(self.instructions.read(self.position + 3), 2, 1 if values[0] == values[1] else 0)
 
         self.position += 4
     
@@ -296,6 +1571,54 @@ class Program():
 
         # Jump two positions.
         self.position += 2
+    
+    def executeHalt(self):
+        return FINISH_HALT
+    
+    # Executes a comparison and the jump after it, that reads its result.
+    def executeCompareAndJump(self):
+        values = self.parseParameters(self.position + 1, 2)
+        address = self.instructions.read(self.position + 3)
+        if self.opcode.opcode == OPCODE_LESS_THAN:
+            self.store(address, 1 if values[0] < values[1] else 0)
+        else:
+            self.store(address, 1 if values[0] == values[1] else 0)
+        self.position += 4
+
+        # The jump is left to the interpreter if the comparison changed it.
+        memory = self.instructions
+        following = self.opcode.next
+        if self.decoded.get(self.position) is not following or memory.read(self.position + 1) != address:
+            return
+
+        # The condition is the value just stored, the target is read as the jump does.
+        self.opcode = following
+        condition = memory.read(address)
+        mode = following.modes[1]
+        target = memory.read(self.position + 2)
+        if mode == PARAM_MODE_POSITION:
+            target = memory.read(target)
+        elif mode == PARAM_MODE_RELATIVE:
+            target = memory.read(target + self.relativeBase)
+        if (condition != 0) == (following.opcode == OPCODE_JUMP_IF_TRUE):
+            self.position = target
+        else:
+            self.position += 3
+    
+    # Executes a relative base offset and the instruction after it.
+    def executeOffsetAndStore(self):
+        self.relativeBase += self.parseParameters(self.position + 1, 1)[0]
+        self.position += 2
+
+        following = self.opcode.next
+        if self.decoded.get(self.position) is not following:
+            return
+        self.opcode = following
+        return following.handler()
+    
+    def executeUnknown(self):
+        print('ERROR: opcode {} not recognised by the computer'.format(self.instructions[self.position]))
+        return FINISH_ERROR
 
 # Stores information about an opcode.
 class Opcode():
@@ -305,10 +1628,459 @@ class Opcode():
 
         # Get the modes of the parameters specified.
         self.modes = []
-        value = int(opcode / 100)
+        value = opcode // 100
         while value >= 1:
             self.modes.append(value % 10)
-            value = int(value / 10)
+            value //= 10
+
+        # Parameters without a mode specified default to position mode.
+        self.length = OPCODE_LENGTHS.get(self.opcode, 1)
+        while len(self.modes) < self.length - 1:
+            self.modes.append(PARAM_MODE_POSITION)
+
+        # Methods of the program that execute this instruction, set when decoded.
+        # The handler can also execute the next instruction, kept here, when both
+        # are fused, while the plain handler always executes only this one.
+        self.handler = None
+        self.plainHandler = None
+        self.next = None
+
+# Value of a cell in an iteration of a loop being summarized, as a constant plus
+# the values some cells had at the start of the iteration, each one multiplied
+# by a factor.
+class Linear():
+    def __init__(self, constant, terms=None):
+        self.constant = constant
+        self.terms = terms if terms != None else {}
+
+    def add(self, other):
+        terms = dict(self.terms)
+        for cell, factor in other.terms.items():
+            terms[cell] = terms.get(cell, 0) + factor
+            if terms[cell] == 0:
+                del terms[cell]
+
+        return Linear(self.constant + other.constant, terms)
+
+    def scale(self, factor):
+        if factor == 0:
+            return Linear(0)
+
+        return Linear(self.constant * factor, {cell: value * factor for cell, value in self.terms.items()})
+
+    # Cells the value depends on.
+    def symbols(self):
+        return list(self.terms)
+
+    # Returns the value given the values of the cells it depends on.
+    def evaluate(self, values):
+        return self.constant + sum(factor * values[cell] for cell, factor in self.terms.items())
+
+# Result of comparing two linear values in an iteration of a loop being summarized.
+class Comparison():
+    def __init__(self, opcode, left, right):
+        self.opcode = opcode
+        self.left = left
+        self.right = right
+
+    def symbols(self):
+        return self.left.symbols() + self.right.symbols()
+
+    def evaluate(self, values):
+        left = self.left.evaluate(values)
+        right = self.right.evaluate(values)
+        if self.opcode == OPCODE_LESS_THAN:
+            return 1 if left < right else 0
+
+        return 1 if left == right else 0
+
+# Raised while analyzing a loop that cannot be summarized.
+class LoopError(Exception):
+    pass
+
+# Call followed by the memoized engine: the cells it read before writing them
+# with their values, the cells it wrote with their last values, and the cells it
+# used in relative and in absolute mode.
+class CallTrace():
+    def __init__(self, entry, base, end):
+        self.entry = entry
+        self.base = base
+        self.end = end
+        self.reads = {}
+        self.writes = {}
+        self.relative = set()
+        self.absolute = set()
+
+    def read(self, address, value, relative):
+        if not address in self.reads and not address in self.writes:
+            self.reads[address] = value
+        if relative:
+            self.relative.add(address)
+        else:
+            self.absolute.add(address)
+
+    def write(self, address, value, relative):
+        self.writes[address] = value
+        if relative:
+            self.relative.add(address)
+        else:
+            self.absolute.add(address)
+
+    # Adds what a call made from this one read and wrote, and the cells it used
+    # in relative and in absolute mode.
+    def merge(self, reads, writes, relative, absolute):
+        for address, value in reads.items():
+            if not address in self.reads and not address in self.writes:
+                self.reads[address] = value
+        self.writes.update(writes)
+        self.relative.update(relative)
+        self.absolute.update(absolute)
+
+# What a call remembered by the memoized engine wrote, with the cells in relative
+# mode as offsets from its relative base, and where it returned.
+class RememberedCall():
+    def __init__(self, trace):
+        self.base = trace.base
+        self.end = trace.end
+        self.writes = tuple((address - trace.base, True, value) if address in trace.relative else (address, False, value) for address, value in trace.writes.items())
+
+        # Cells used in each mode, to check that moving the relative base does not
+        # make them overlap.
+        self.relative = tuple(address - trace.base for address in trace.relative)
+        self.absolute = frozenset(trace.absolute)
+
+# What a program did while executed with the profiled engine.
+class Profile():
+    def __init__(self):
+        # Number of instructions executed by opcode and by address.
+        self.opcodes = {}
+        self.addresses = {}
+
+        # Seconds executing, and the part of them waiting for inputs.
+        self.totalTime = 0.0
+        self.inputTime = 0.0
+        self.waitStart = None
+
+    # Number of instructions executed.
+    @property
+    def instructions(self):
+        return sum(self.opcodes.values())
+
+    # Number of outputs sent.
+    @property
+    def outputs(self):
+        return self.opcodes.get(OPCODE_OUTPUT, 0)
+
+    # Instructions executed per second, not counting the time waiting for inputs.
+    def rate(self):
+        seconds = self.totalTime - self.inputTime
+        return self.instructions / seconds if seconds > 0 else 0
+
+    # Returns the most executed addresses with their counts, most executed first.
+    def hotAddresses(self, number=10):
+        return sorted(self.addresses.items(), key=lambda item: (-item[1], item[0]))[:number]
+
+    # Returns a text report with the totals, the instructions by opcode and the
+    # hottest addresses of a program with the instruction at each of them.
+    def report(self, program, number=10):
+        lines = ['Instructions: {}'.format(self.instructions)]
+        lines.append('Outputs: {}'.format(self.outputs))
+        lines.append('Time: {:.3f}s, waiting for inputs: {:.3f}s'.format(self.totalTime, self.inputTime))
+        lines.append('Instructions per second: {:.0f}'.format(self.rate()))
+        lines.append('')
+        lines.append('Opcode      Count')
+        for opcode, count in sorted(self.opcodes.items(), key=lambda item: -item[1]):
+            lines.append('{:<6} {:>10}'.format(OPCODE_NAMES.get(opcode, opcode), count))
+        lines.append('')
+        lines.append('Address      Count  Instruction')
+        for address, count in self.hotAddresses(number):
+            lines.append('{:>7} {:>10}  {}'.format(address, count, describeInstruction(program.instructions, address)))
+
+        return '\n'.join(lines)
+
+# Instructions of a program loaded once and shared, without being copied, by all
+# the programs created from it. They write to their own copy of each page.
+class ProgramImage():
+    def __init__(self, instructions):
+        self.memory = Memory(instructions)
+        self.hash = None
+
+    def __len__(self):
+        return len(self.memory)
+
+    # Returns a hash of the instructions, computed only the first time.
+    def digest(self):
+        if self.hash == None:
+            self.hash = hashlib.sha256(repr(self.memory.tolist()).encode()).hexdigest()
+
+        return self.hash
+
+# Read-only access to a list, a deque or a memory without copying it. Slices are
+# returned as new lists.
+class ReadOnlyView():
+    def __init__(self, source):
+        self.source = source
+
+    def __len__(self):
+        return len(self.source)
+
+    def __iter__(self):
+        return iter(self.source)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.source[i] for i in range(*index.indices(len(self.source)))]
+
+        return self.source[index]
+
+# Execution state of a program at some point.
+class Snapshot():
+    def __init__(self, program):
+        self.memory = program.instructions.copy()
+        self.position = program.position
+        self.relativeBase = program.relativeBase
+        self.inputs = copyList(program.inputs)
+        self.outputs = copyList(program.outputs)
+
+        # Inputs coming from an iterator are split so both can consume them. An
+        # iterator that was already split is copied instead of wrapped again.
+        self.inputSource = None
+        if program.inputSource != None:
+            program.inputSource, self.inputSource = itertools.tee(program.inputSource)
+        self.pendingInputs = copyList(program.pendingInputs)
+        self.pauseBeforeNextInput = program.pauseBeforeNextInput
+        self.returnAfterInput = program.returnAfterInput
+
+# Memory of a program. Addresses are grouped in pages that are only allocated when
+# written, so reading an address never used returns 0 and a program touching a
+# far away address does not need all the memory up to it. Pages are typed arrays
+# until a value does not fit in them, and only that page becomes a list.
+class Memory():
+    def __init__(self, cells=[]):
+        self.pages = []
+        self.farPages = {}
+
+        # Numbers of the pages only used by this memory. The rest are shared with
+        # other copies and have to be copied before writing to them.
+        self.owned = set()
+
+        # Numbers of the pages written since this memory was created.
+        self.dirty = set()
+
+        # Number of addresses used so far, and how many of them are in the page table.
+        self.size = 0
+        self.denseSize = 0
+
+        # Program executing from this memory, if any. Copies do not belong to it.
+        self.owner = None
+
+        # Copy the cells page by page.
+        cells = cells if isinstance(cells, (list, array)) else list(cells)
+        for start in range(0, len(cells), PAGE_SIZE):
+            page = newPage(cells[start:start + PAGE_SIZE])
+            page.extend(ZERO_PAGE[:PAGE_SIZE - len(page)])
+            self.pages.append(page)
+            self.owned.add(len(self.pages) - 1)
+        if len(cells) > 0:
+            self.touch(len(cells) - 1)
+    
+    # Makes sure the memory reaches the given address.
+    def touch(self, address):
+        if address < 0:
+            raise IndexError('address {} is negative'.format(address))
+
+        if address >= self.size:
+            self.size = address + 1
+            self.denseSize = min(self.size, DENSE_LIMIT)
+
+            # Extend the page table to cover the dense part of the memory.
+            while len(self.pages) << PAGE_SHIFT < self.denseSize:
+                self.pages.append(ZERO_PAGE)
+    
+    # Returns the value stored at an address.
+    def read(self, address):
+        if 0 <= address < self.denseSize:
+            return self.pages[address >> PAGE_SHIFT][address & PAGE_MASK]
+
+        self.touch(address)
+        return self.peek(address)
+    
+    # Returns the value stored at an address without extending the memory used.
+    def peek(self, address):
+        if address < 0:
+            raise IndexError('address {} is negative'.format(address))
+
+        number = address >> PAGE_SHIFT
+        if number < len(self.pages):
+            return self.pages[number][address & PAGE_MASK]
+
+        page = self.farPages.get(number)
+        return page[address & PAGE_MASK] if page != None else 0
+    
+    # Stores a value at an address, allocating or copying its page if needed.
+    def write(self, address, value):
+        number = address >> PAGE_SHIFT
+        pages = self.pages
+        if not 0 <= address < self.denseSize:
+            self.touch(address)
+            if address >= DENSE_LIMIT:
+                pages = self.farPages
+                if not number in self.owned:
+                    pages[number] = pages.get(number, ZERO_PAGE)[:]
+                    self.owned.add(number)
+                    self.dirty.add(number)
+
+        if not number in self.owned:
+            pages[number] = pages[number][:]
+            self.owned.add(number)
+            self.dirty.add(number)
+        try:
+            pages[number][address & PAGE_MASK] = value
+        except (OverflowError, TypeError):
+            pages[number] = list(pages[number])
+            pages[number][address & PAGE_MASK] = value
+    
+    # Returns a copy of this memory. Pages are shared by both until written.
+    def copy(self):
+        memory = Memory()
+        memory.pages = list(self.pages)
+        memory.farPages = dict(self.farPages)
+        memory.size = self.size
+        memory.denseSize = self.denseSize
+        memory.dirty = set(self.dirty)
+        self.owned = set()
+
+        return memory
+    
+    # Returns a list with all the values up to the last address used.
+    def tolist(self):
+        cells = []
+        for page in self.pages:
+            cells.extend(page)
+        for number in range(len(self.pages), (self.size + PAGE_MASK) >> PAGE_SHIFT):
+            cells.extend(self.farPages.get(number, ZERO_PAGE))
+
+        return cells[:self.size]
+    
+    def __len__(self):
+        return self.size
+    
+    def __iter__(self):
+        return iter(self.tolist())
+    
+    # Reading like a list does not extend the memory used.
+    def __getitem__(self, address):
+        return self.peek(address)
+    
+    # Writing like a list goes through the program using the memory, so it forgets
+    # the code decoded or compiled from the address.
+    def __setitem__(self, address, value):
+        if self.owner != None:
+            self.owner.store(address, value)
+        else:
+            self.write(address, value)
+
+# Builds the table of the fast engine, indexed by the whole value of an opcode, with
+# the opcode and the modes of its three parameters. Inputs, and values with modes
+# that are not valid or not used by the instruction, are not in it, so the
+# interpreter runs them.
+def buildFastOpcodes():
+    global fastOpcodes
+    fastOpcodes = {}
+    for opcode, length in OPCODE_LENGTHS.items():
+        if opcode == OPCODE_INPUT:
+            continue
+        for modes in itertools.product(range(3), repeat=length - 1):
+            value = opcode + sum(mode * 10 ** (i + 2) for i, mode in enumerate(modes))
+            fastOpcodes[value] = (opcode,) + modes + (PARAM_MODE_POSITION,) * (4 - length)
+
+    return fastOpcodes
+
+# Receives some outputs and returns the runs of ASCII character codes in them
+# joined in strings, and the rest of the outputs as they are. Outputs are first
+# converted to bytes a chunk at a time, and only the chunks with something that is
+# not a character are split one output at a time.
+def decodeAscii(values):
+    values = values if isinstance(values, list) else list(values)
+    items = []
+    text = []
+    for start in range(0, len(values), ASCII_CHUNK_SIZE):
+        chunk = values[start:start + ASCII_CHUNK_SIZE]
+        try:
+            data = bytes(chunk)
+            if data.isascii():
+                text.append(data.decode('ascii'))
+                continue
+        except ValueError:
+            pass
+
+        for value in chunk:
+            if 0 <= value < 128:
+                text.append(chr(value))
+            else:
+                if len(text) > 0:
+                    items.append(''.join(text))
+                    text = []
+                items.append(value)
+    if len(text) > 0:
+        items.append(''.join(text))
+
+    return items
+
+# Returns a typed page with the given values, or a list if some of them do not fit.
+def newPage(values):
+    try:
+        return array(PAGE_TYPECODE, values)
+    except (OverflowError, TypeError):
+        return list(values)
+
+# Returns a value of a loop as a linear one, computing comparisons that do not
+# depend on any cell. Raises LoopError otherwise.
+def linear(value):
+    if isinstance(value, Linear):
+        return value
+    if len(value.symbols()) > 0:
+        raise LoopError()
+
+    return Linear(value.evaluate({}))
+
+# Returns the first iteration of a loop where a value is zero, or not zero if
+# exitWhenZero is False, given a function that evaluates it in an iteration. The
+# value must grow by the same step every iteration, or be a comparison of values
+# that do. Returns None if no iteration matches.
+def firstExit(value, exitWhenZero, evaluate):
+    if isinstance(value, Comparison):
+        difference = value.left.add(value.right.scale(-1))
+        if value.opcode == OPCODE_LESS_THAN:
+            match = MATCH_NONNEGATIVE if exitWhenZero else MATCH_NEGATIVE
+        else:
+            match = MATCH_NONZERO if exitWhenZero else MATCH_ZERO
+    else:
+        difference = value
+        match = MATCH_ZERO if exitWhenZero else MATCH_NONZERO
+
+    first = evaluate(difference, 0)
+    step = evaluate(difference, 1) - first
+    return firstMatch(first, step, match)
+
+# Returns the first number n from 0 where first + step * n matches, or None.
+def firstMatch(first, step, match):
+    if match == MATCH_ZERO:
+        if step == 0:
+            return 0 if first == 0 else None
+        return -first // step if -first % step == 0 and -first // step >= 0 else None
+    elif match == MATCH_NONZERO:
+        if first != 0:
+            return 0
+        return 1 if step != 0 else None
+    elif match == MATCH_NEGATIVE:
+        if first < 0:
+            return 0
+        return first // -step + 1 if step < 0 else None
+    else:
+        if first >= 0:
+            return 0
+        return (-first + step - 1) // step if step > 0 else None
 
 # Creates a copy of the list provided as a parameter.
 def copyList(givenList):
@@ -318,17 +2090,351 @@ def copyList(givenList):
     
     return result
 
+# Returns the instruction at an address of a memory as text, with its parameters
+# as numbers in value mode, [address] in position mode and [rb+offset] in relative mode.
+def describeInstruction(memory, address):
+    opcode = Opcode(memory[address])
+    if not opcode.opcode in OPCODE_NAMES:
+        return 'data {}'.format(memory[address])
+
+    parameters = []
+    for i in range(opcode.length - 1):
+        cell = memory[address + i + 1]
+        if opcode.modes[i] == PARAM_MODE_POSITION:
+            parameters.append('[{}]'.format(cell))
+        elif opcode.modes[i] == PARAM_MODE_VALUE:
+            parameters.append(str(cell))
+        elif opcode.modes[i] == PARAM_MODE_RELATIVE:
+            parameters.append('[rb{:+d}]'.format(cell))
+        else:
+            parameters.append('?{}'.format(cell))
+
+    return ' '.join([OPCODE_NAMES[opcode.opcode], ', '.join(parameters)]).rstrip()
+
 # Receives a filename and returns a program with the instructions set to the
-# values inside the file.
+# values inside the file. The cells of the image are used as they are.
 def readProgramFromFile(filename):
-    return Program(readInstructionsFromFile(filename))
+    return Program(loadInstructions(filename))
 
-# Reads instructions from a file and returns them.
+# Reads instructions from a file and returns them as a list.
 def readInstructionsFromFile(filename):
+    cells = loadInstructions(filename)
+
+    return cells.tolist() if isinstance(cells, array) else cells
+
+# Returns the instructions of a file, loaded from its binary image, which is built
+# the first time and every time the file changes. They are an array of int64
+# numbers, or a list if some do not fit or the file had to be parsed.
+def loadInstructions(filename):
+    cells = readImage(filename)
+    if cells == None:
+        cells = parseInstructionsFile(filename)
+        writeImage(filename, cells)
+
+    return cells
+
+# Parses the comma separated instructions of a text file.
+def parseInstructionsFile(filename):
     with open(filename, 'r') as inputFile:
         instructions = [int(element) for element in inputFile.read().rstrip('\n').replace(' ', '').split(',')]
     
     return instructions
 
+# Returns the instructions in the binary image of a file, mapped in memory, or None
+# if there is no image, it does not belong to the current version of the file or
+# it is shorter than its header says. The instructions are an array of int64
+# numbers, or a list if some do not fit.
+def readImage(filename):
+    try:
+        source = os.stat(filename)
+        with open(filename + IMAGE_EXTENSION, 'rb') as imageFile:
+            with mmap.mmap(imageFile.fileno(), 0, access=mmap.ACCESS_READ) as image:
+                if len(image) < IMAGE_HEADER.size:
+                    return None
+                magic, order, modified, size, count, bigCount = IMAGE_HEADER.unpack_from(image)
+                if magic != IMAGE_MAGIC or order != 1 or modified != source.st_mtime_ns or size != source.st_size:
+                    return None
+
+                # The cells are copied from the image as they are, without parsing.
+                end = IMAGE_HEADER.size + 8 * count
+                if count < 0 or len(image) < end:
+                    return None
+                cells = array('q')
+                cells.frombytes(image[IMAGE_HEADER.size:end])
+                if bigCount == 0:
+                    return cells
+
+                cells = cells.tolist()
+                for i in range(bigCount):
+                    index, length = IMAGE_BIG_NUMBER.unpack_from(image, end)
+                    end += IMAGE_BIG_NUMBER.size
+                    if not 0 <= index < count or len(image) < end + length:
+                        return None
+                    cells[index] = int(image[end:end + length])
+                    end += length
+                return cells
+    except (OSError, ValueError, struct.error):
+        return None
+
+# Writes the binary image of a file with its instructions. Images that cannot be
+# written are skipped, the text file is parsed again the next time.
+def writeImage(filename, instructions):
+    cells = array('q')
+    bigNumbers = []
+    for i, number in enumerate(instructions):
+        if -2 ** 63 <= number < 2 ** 63:
+            cells.append(number)
+        else:
+            cells.append(0)
+            bigNumbers.append((i, str(number).encode()))
+
+    try:
+        source = os.stat(filename)
+        temporary = '{}{}.{}'.format(filename, IMAGE_EXTENSION, os.getpid())
+        with open(temporary, 'wb') as imageFile:
+            imageFile.write(IMAGE_HEADER.pack(IMAGE_MAGIC, 1, source.st_mtime_ns, source.st_size, len(cells), len(bigNumbers)))
+            imageFile.write(cells.tobytes())
+            for index, text in bigNumbers:
+                imageFile.write(IMAGE_BIG_NUMBER.pack(index, len(text)))
+                imageFile.write(text)
+        os.replace(temporary, filename + IMAGE_EXTENSION)
+    except OSError:
+        pass
+
 def copyProgram(initialProgram):
     return Program(initialProgram.instructions)
+
+# An independent execution of a program: the values written in memory before
+# starting and the inputs it receives.
+class Job():
+    def __init__(self, patches=None, inputs=None):
+        self.patches = patches if patches != None else {}
+        self.inputs = inputs if inputs != None else []
+
+# What an execution leaves: its outputs and the values of the memory cells asked for.
+class JobResult():
+    def __init__(self, outputs, cells, memory=None):
+        self.outputs = outputs
+        self.cells = cells
+
+        # Whole memory at the end, only kept by the result cache.
+        self.memory = memory
+
+# Keeps the results of complete executions, that only depend on the program, the
+# values written in memory before starting and the inputs, so the same execution
+# is never repeated. The results used least recently are dropped when the memory
+# cells and outputs of all of them go over the capacity. If a filename is given,
+# the results are loaded from it and save() writes them back, so they are kept
+# between processes.
+class ResultCache():
+    def __init__(self, capacity=RESULT_CACHE_SIZE, filename=None):
+        self.capacity = capacity
+        self.filename = filename
+        self.results = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+        if filename != None and os.path.exists(filename):
+            with open(filename, 'rb') as cacheFile:
+                for key, result in pickle.load(cacheFile):
+                    self.add(key, result)
+
+    def __len__(self):
+        return len(self.results)
+
+    # Returns the key of an execution of an image with a job.
+    def key(self, image, job):
+        patches = sorted(job.patches.items())
+        return hashlib.sha256(repr((image.digest(), patches, list(job.inputs))).encode()).hexdigest()
+
+    # Executes a job on a program image, given as an image or a list of instructions,
+    # or returns its result if it was already executed. The result has the outputs
+    # and the whole final memory, and is shared by every call, so it must not be
+    # changed. Executions that run out of inputs are not kept, and return None.
+    def run(self, image, job):
+        if not isinstance(image, ProgramImage):
+            image = ProgramImage(image)
+        key = self.key(image, job)
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+
+        self.misses += 1
+        program = Program(image)
+        program.printOutputs(False)
+        program.waitForInput = True
+        for address, value in job.patches.items():
+            program.setMemory(address, value)
+        program.setInputs(copyList(job.inputs))
+        if program.execute() != FINISH_HALT:
+            return None
+
+        result = JobResult(program.getOutputs(), {}, program.getInstructions())
+        self.add(key, result)
+        return result
+
+    # Keeps a result, dropping the least recently used ones if there is no space.
+    def add(self, key, result):
+        size = len(result.outputs) + len(result.memory)
+        if size > self.capacity:
+            return
+        if key in self.results:
+            self.size -= len(self.results[key].outputs) + len(self.results[key].memory)
+        self.results[key] = result
+        self.results.move_to_end(key)
+        self.size += size
+        while self.size > self.capacity:
+            oldKey, oldResult = self.results.popitem(last=False)
+            self.size -= len(oldResult.outputs) + len(oldResult.memory)
+
+    # Writes the results to the file of the cache, least recently used first.
+    def save(self):
+        temporary = '{}.{}'.format(self.filename, os.getpid())
+        with open(temporary, 'wb') as cacheFile:
+            pickle.dump(list(self.results.items()), cacheFile)
+        os.replace(temporary, self.filename)
+
+# Raised when a replay does not match its recording.
+class ReplayError(Exception):
+    pass
+
+# Inputs and outputs of a program in the order they happened, each one with the
+# number of instructions executed since the previous one, and the finish code of
+# the last execution.
+class Recording():
+    def __init__(self):
+        self.digest = None
+        self.events = []
+        self.finish = None
+
+        # Instructions executed by the program when the last event happened.
+        self.last = 0
+
+    # Adds an event that happened when the program had executed some instructions.
+    def add(self, kind, instructions, value):
+        self.events.append((kind, instructions - self.last, value))
+        self.last = instructions
+
+    # Returns the values of the events of a kind, in order.
+    def values(self, kind):
+        return [value for eventKind, instructions, value in self.events if eventKind == kind]
+
+    # Number of instructions executed from the start of the recording to the last event.
+    @property
+    def instructions(self):
+        return sum(instructions for kind, instructions, value in self.events)
+
+    # Writes the recording to a file, replacing it at once.
+    def save(self, filename):
+        numbers = ' '.join('{} {} {}'.format(*event) for event in self.events)
+        temporary = '{}.{}'.format(filename, os.getpid())
+        with open(temporary, 'wb') as recordingFile:
+            recordingFile.write(RECORDING_HEADER.pack(RECORDING_MAGIC, self.digest.encode(), len(self.events), self.finish))
+            recordingFile.write(zlib.compress(numbers.encode()))
+        os.replace(temporary, filename)
+
+# Program that does not execute its instructions but repeats a recording of them,
+# sending the recorded outputs and checking that the inputs it receives are the
+# recorded ones. It follows the same settings as a program, so the code using a
+# program can use a replay instead. The memory is not replayed.
+class ReplayProgram(Program):
+    def __init__(self, recording, instructions):
+        Program.__init__(self, instructions)
+        if self.image.digest() != recording.digest:
+            raise ReplayError('the recording was made with a different program')
+        self.replay = recording
+        self.replayed = 0
+
+    def execute(self):
+        events = self.replay.events
+        while self.replayed < len(events):
+            kind, instructions, value = events[self.replayed]
+            if kind == EVENT_OUTPUT:
+                self.replayed += 1
+                self.sendOutput(value)
+                if self.terminal:
+                    print('Output: {}'.format(value))
+                self.numOutputsToReturn -= 1
+                if self.numOutputsToReturn == 0:
+                    return FINISH_OUTPUT
+                continue
+
+            # Receive the input as the program would.
+            if self.pauseBeforeNextInput:
+                return FINISH_PAUSE_INPUT
+            number = self.nextInput()
+            if number == None:
+                if self.waitForInput:
+                    return FINISH_WAIT_INPUT
+                number = input('Input: ')
+            if int(number) != value:
+                raise ReplayError('input {} received instead of the recorded {}'.format(number, value))
+            self.replayed += 1
+            if self.returnAfterInput:
+                self.returnAfterInput = False
+                return FINISH_AFTER_INPUT
+
+        return self.replay.finish
+
+# Reads a recording written to a file.
+def readRecording(filename):
+    with open(filename, 'rb') as recordingFile:
+        data = recordingFile.read()
+    magic, digest, count, finish = RECORDING_HEADER.unpack_from(data)
+    if magic != RECORDING_MAGIC:
+        raise ReplayError('{} is not a recording'.format(filename))
+
+    recording = Recording()
+    recording.digest = digest.decode()
+    recording.finish = finish
+    numbers = [int(number) for number in zlib.decompress(data[RECORDING_HEADER.size:]).split()]
+    recording.events = [tuple(numbers[i:i + 3]) for i in range(0, 3 * count, 3)]
+
+    return recording
+
+# Executes many independent jobs of the same program on a pool of worker processes.
+# Each worker receives the instructions once, when it starts, and the jobs are
+# sent in chunks. Returns the result of every job in the same order as the jobs.
+# If a stopWhen function is given, the jobs not started yet are cancelled as soon
+# as it returns True for a result, and their results are None.
+def runMany(instructions, jobs, workers=None, cells=[], stopWhen=None, engine=ENGINE_INTERPRETER, chunkSize=JOB_CHUNK_SIZE):
+    jobs = copyList(jobs)
+    results = [None] * len(jobs)
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=startWorker, initargs=(copyList(instructions), engine)) as executor:
+        chunks = {}
+        for start in range(0, len(jobs), chunkSize):
+            chunks[executor.submit(runJobs, jobs[start:start + chunkSize], cells)] = start
+
+        for chunk in concurrent.futures.as_completed(chunks):
+            chunkResults = chunk.result()
+            results[chunks[chunk]:chunks[chunk] + len(chunkResults)] = chunkResults
+            if stopWhen != None and any(stopWhen(result) for result in chunkResults):
+                executor.shutdown(cancel_futures=True)
+                break
+
+    return results
+
+# Prepares a worker process of runMany.
+def startWorker(instructions, engine):
+    global workerProgram
+    workerProgram = Program(instructions)
+    workerProgram.printOutputs(False)
+    workerProgram.setEngine(engine)
+
+# Executes a chunk of jobs inside a worker process and returns their results.
+def runJobs(jobs, cells):
+    results = []
+    program = workerProgram
+    for job in jobs:
+        program.reset()
+        for address, value in job.patches.items():
+            program.setMemory(address, value)
+        # A job without enough inputs stops waiting for them instead of asking.
+        program.setInputs(job.inputs)
+        program.waitForInput = True
+        program.execute()
+        results.append(JobResult(program.getOutputs(), {address: program.instructions[address] for address in cells}))
+
+    return results
@@ -0,0 +1,285 @@
+# disassembler.py finds the code of an Intcode program without executing it, and
+# builds its control flow graph. Run it with a file to print an annotated listing:
+# python disassembler.py 09/input.dat
+import sys
+import computer
+
+# Opcodes that can change the position to somewhere else than the next instruction.
+JUMP_OPCODES = [computer.OPCODE_JUMP_IF_TRUE, computer.OPCODE_JUMP_IF_FALSE]
+
+# Opcodes that write to memory, with the index of the parameter written.
+WRITE_PARAMETERS = {
+    computer.OPCODE_SUM: 2,
+    computer.OPCODE_MULTIPLY: 2,
+    computer.OPCODE_INPUT: 0,
+    computer.OPCODE_LESS_THAN: 2,
+    computer.OPCODE_EQUALS: 2
+}
+
+# A single instruction found in the program.
+class Instruction():
+    def __init__(self, memory, address):
+        self.address = address
+        self.opcode = computer.Opcode(memory[address])
+        self.length = self.opcode.length
+        self.cells = [memory[address + i + 1] for i in range(self.length - 1)]
+        self.valid = self.opcode.opcode in computer.OPCODE_NAMES and max(self.opcode.modes, default=0) <= computer.PARAM_MODE_RELATIVE
+
+        # Addresses that can come after this instruction, and the kind of jump
+        # when it is a call to a subroutine or a return from one.
+        self.successors = []
+        self.indirect = False
+        self.call = False
+        self.ret = False
+
+    # Address right after this instruction.
+    @property
+    def next(self):
+        return self.address + self.length
+
+    # Address written by this instruction if it is fixed, None otherwise.
+    def writtenAddress(self):
+        index = WRITE_PARAMETERS.get(self.opcode.opcode)
+        if index == None or self.opcode.modes[index] != computer.PARAM_MODE_POSITION:
+            return None
+
+        return self.cells[index]
+
+# Instructions executed one after the other, only entered by the first one.
+class Block():
+    def __init__(self, start):
+        self.start = start
+        self.instructions = []
+        self.successors = []
+
+    # Address right after the last instruction of the block.
+    @property
+    def end(self):
+        return self.instructions[-1].next
+
+# What the analysis finds out about a program.
+class Analysis():
+    def __init__(self, memory):
+        self.memory = memory
+
+        # Instructions reachable from the entry point by their address, and the
+        # memory cells they use.
+        self.instructions = {}
+        self.code = set()
+
+        # Basic blocks by their first address, and the addresses jumped to.
+        self.blocks = {}
+        self.jumpTargets = set()
+
+        # Addresses of the subroutines called, and of the instructions that call
+        # them and return from them.
+        self.subroutines = set()
+        self.calls = set()
+        self.returns = set()
+
+        # Pairs of instruction address and address it writes inside the code, and
+        # the instructions writing to an address that is not known beforehand.
+        self.selfModifyingWrites = []
+        self.unknownWrites = set()
+
+    # Returns the ranges of addresses, as pairs of first and last address, that
+    # no reachable instruction uses. They are data or dead code.
+    def unreachableRegions(self):
+        regions = []
+        start = None
+        for address in range(len(self.memory) + 1):
+            if address < len(self.memory) and not address in self.code:
+                if start == None:
+                    start = address
+            elif start != None:
+                regions.append((start, address - 1))
+                start = None
+
+        return regions
+
+    # Returns True if some instruction may write over the given address.
+    def mayBeWritten(self, address):
+        return len(self.unknownWrites) > 0 or any(target == address for writer, target in self.selfModifyingWrites)
+
+# Analyzes a program given as a list of instructions, starting at the entry point.
+def analyze(instructions, entry=0):
+    memory = computer.Memory(instructions)
+
+    # Values read from cells written by the program are not known, so the analysis
+    # is repeated until the set of written cells does not change.
+    written = set()
+    while True:
+        analysis = traverse(memory, entry, written)
+        found = set(instruction.writtenAddress() for instruction in analysis.instructions.values() if instruction.writtenAddress() != None)
+        if found <= written:
+            break
+        written |= found
+
+    buildBlocks(analysis, entry)
+    findSelfModifyingWrites(analysis)
+
+    return analysis
+
+# Follows every path from the entry point and finds the reachable instructions.
+# The values in the written cells are considered unknown.
+def traverse(memory, entry, written):
+    analysis = Analysis(memory)
+    pending = [entry]
+    while len(pending) > 0:
+        address = pending.pop()
+        if address in analysis.instructions or address < 0 or address >= len(memory):
+            continue
+
+        instruction = Instruction(memory, address)
+        analysis.instructions[address] = instruction
+        analysis.code.update(range(address, address + instruction.length))
+        if not instruction.valid or instruction.opcode.opcode == computer.OPCODE_HALT:
+            continue
+        if instruction.opcode.opcode in WRITE_PARAMETERS and instruction.opcode.modes[WRITE_PARAMETERS[instruction.opcode.opcode]] == computer.PARAM_MODE_RELATIVE:
+            analysis.unknownWrites.add(address)
+
+        if instruction.opcode.opcode in JUMP_OPCODES:
+            followJump(analysis, instruction, written)
+        else:
+            instruction.successors = [instruction.next]
+        pending.extend(instruction.successors)
+
+    return analysis
+
+# Finds where a jump can go. A jump right after storing its own next address in
+# the stack, pointed by the relative base, is a call that eventually returns
+# there, and a jump to an address read from the stack is a return.
+def followJump(analysis, instruction, written):
+    condition = constantParameter(analysis.memory, instruction, 0, written)
+    target = constantParameter(analysis.memory, instruction, 1, written)
+    jumpIfTrue = instruction.opcode.opcode == computer.OPCODE_JUMP_IF_TRUE
+
+    # Decide if the jump is always, never or maybe taken.
+    taken = condition == None or (condition != 0) == jumpIfTrue
+    fallsThrough = condition == None or (condition != 0) != jumpIfTrue
+    if fallsThrough:
+        instruction.successors.append(instruction.next)
+    if taken:
+        if target != None:
+            instruction.successors.append(target)
+            analysis.jumpTargets.add(target)
+        else:
+            instruction.indirect = True
+            if instruction.opcode.modes[1] == computer.PARAM_MODE_RELATIVE:
+                instruction.ret = True
+                analysis.returns.add(instruction.address)
+
+    # Look for the return address stored by the previous instruction.
+    previous = analysis.instructions.get(instruction.address - 4)
+    if taken and not fallsThrough and target != None and previous != None and storedConstant(previous) == instruction.next:
+        instruction.call = True
+        instruction.successors.append(instruction.next)
+        analysis.calls.add(instruction.address)
+        analysis.subroutines.add(target)
+
+# Returns the value of a parameter of an instruction if it is known without
+# executing the program, None otherwise.
+def constantParameter(memory, instruction, index, written):
+    mode = instruction.opcode.modes[index]
+    if mode == computer.PARAM_MODE_VALUE:
+        return instruction.cells[index]
+    elif mode == computer.PARAM_MODE_POSITION and not instruction.cells[index] in written and instruction.cells[index] >= 0:
+        return memory[instruction.cells[index]]
+
+    return None
+
+# Returns the constant an instruction stores in the stack by adding 0 to it or
+# multiplying it by 1, None if it does something else.
+def storedConstant(instruction):
+    code = instruction.opcode
+    if not code.opcode in [computer.OPCODE_SUM, computer.OPCODE_MULTIPLY] or code.modes[0] != computer.PARAM_MODE_VALUE or code.modes[1] != computer.PARAM_MODE_VALUE or code.modes[2] != computer.PARAM_MODE_RELATIVE:
+        return None
+
+    neutral = 0 if code.opcode == computer.OPCODE_SUM else 1
+    if instruction.cells[0] == neutral:
+        return instruction.cells[1]
+    elif instruction.cells[1] == neutral:
+        return instruction.cells[0]
+
+    return None
+
+# Splits the reachable instructions in basic blocks.
+def buildBlocks(analysis, entry):
+    leaders = set([entry]) | analysis.jumpTargets
+    for instruction in analysis.instructions.values():
+        if len(instruction.successors) != 1 or instruction.indirect or instruction.opcode.opcode in JUMP_OPCODES:
+            leaders.update(instruction.successors)
+
+    for start in sorted(leaders):
+        if not start in analysis.instructions:
+            continue
+        block = Block(start)
+        address = start
+        while True:
+            instruction = analysis.instructions[address]
+            block.instructions.append(instruction)
+            if instruction.successors != [instruction.next] or not instruction.next in analysis.instructions or instruction.next in leaders:
+                break
+            address = instruction.next
+        block.successors = block.instructions[-1].successors
+        analysis.blocks[start] = block
+
+# Finds the instructions that write inside the code of the program.
+def findSelfModifyingWrites(analysis):
+    for instruction in sorted(analysis.instructions.values(), key=lambda instruction: instruction.address):
+        target = instruction.writtenAddress()
+        if target != None and target in analysis.code:
+            analysis.selfModifyingWrites.append((instruction.address, target))
+
+# Returns a listing of the whole program, with the reachable instructions and the
+# rest of the memory as data, and notes about blocks, jumps and writes.
+def listing(analysis):
+    writers = {}
+    for writer, target in analysis.selfModifyingWrites:
+        writers.setdefault(target, []).append(writer)
+
+    lines = []
+    address = 0
+    while address < len(analysis.memory):
+        if not address in analysis.instructions:
+            lines.append('{:>6}   data {}'.format(address, analysis.memory[address]))
+            address += 1
+            continue
+
+        instruction = analysis.instructions[address]
+        if address in analysis.subroutines:
+            lines.append('')
+            lines.append('subroutine_{}:'.format(address))
+        elif address in analysis.blocks:
+            lines.append('block_{}:'.format(address))
+
+        notes = []
+        if instruction.call:
+            notes.append('call')
+        if instruction.ret:
+            notes.append('return')
+        elif instruction.indirect:
+            notes.append('indirect jump')
+        if not instruction.valid:
+            notes.append('invalid instruction')
+        if instruction.writtenAddress() in analysis.code:
+            notes.append('writes code at {}'.format(instruction.writtenAddress()))
+        rewritten = [cell for cell in range(address, instruction.next) if cell in writers]
+        if len(rewritten) > 0:
+            notes.append('rewritten by {}'.format(', '.join(str(writer) for cell in rewritten for writer in writers[cell])))
+        text = computer.describeInstruction(analysis.memory, address)
+        lines.append('{:>6}   {:<32}{}'.format(address, text, '  ; ' + ', '.join(notes) if len(notes) > 0 else '').rstrip())
+        address = instruction.next
+
+    return '\n'.join(lines)
+
+def main(filename):
+    analysis = analyze(computer.readInstructionsFromFile(filename))
+    print(listing(analysis))
+    print()
+    print('Instructions: {}, blocks: {}, subroutines: {}'.format(len(analysis.instructions), len(analysis.blocks), len(analysis.subroutines)))
+    print('Writes inside the code: {}'.format(len(analysis.selfModifyingWrites)))
+    print('Unreachable regions: {}'.format(', '.join('{}-{}'.format(first, last) for first, last in analysis.unreachableRegions())))
+
+if __name__ == '__main__':
+    main(sys.argv[1])
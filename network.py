@@ -0,0 +1,122 @@
+# network.py runs networks of Intcode programs connected by channels, like chains,
+# rings or programs sending to many others. Only the programs with inputs waiting
+# are executed, each one until it needs an input that is not there or it halts,
+# and its outputs are then handed over to the programs it is connected to.
+import time
+from collections import deque
+import computer
+
+# Values going from a program to another one, or out of the network when there is
+# no target. The values going out are kept in the channel.
+class Channel():
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+        self.values = deque()
+
+        # Values carried and number of times they were handed over together, and
+        # the last value carried.
+        self.count = 0
+        self.batches = 0
+        self.last = None
+
+# Programs by name and the channels between them.
+class Network():
+    def __init__(self):
+        self.programs = {}
+        self.channels = {}
+
+        # Outputs of every program, kept until they are handed over.
+        self.outputs = {}
+
+        # Finish code of every program in the last run, and seconds running them.
+        self.results = {}
+        self.seconds = 0.0
+
+    # Adds a program to the network. The program waits for its inputs instead of
+    # asking for them, and its outputs go to the channels leaving it.
+    def addProgram(self, name, program):
+        self.programs[name] = program
+        self.outputs[name] = deque()
+        program.setOutputSink(self.outputs[name])
+        program.waitForInput = True
+        program.returnOnFirstOutput(False)
+
+    # Connects the outputs of a program to the inputs of another one, or to the
+    # outside of the network if there is no target. A program connected to many
+    # others sends all its outputs to every one of them, and a program receiving
+    # from many others takes the values in the order they are handed over.
+    def connect(self, source, target=None):
+        channel = Channel(source, target)
+        self.channels[(source, target)] = channel
+
+        return channel
+
+    # Returns the channel between two programs.
+    def channel(self, source, target=None):
+        return self.channels[(source, target)]
+
+    # Gives inputs to a program from outside the network.
+    def send(self, name, values):
+        self.programs[name].appendToInputs(values)
+
+    # Runs the programs until all of them halt or the ones left are waiting for
+    # inputs that no program will send. Returns FINISH_HALT if all of them halted,
+    # FINISH_WAIT_INPUT if some are waiting, and the finish code of the first one
+    # that stopped for any other reason.
+    def run(self):
+        start = time.perf_counter()
+        leaving = {}
+        for channel in self.channels.values():
+            leaving.setdefault(channel.source, []).append(channel)
+
+        # Every program runs at least once, later only when it receives inputs while
+        # waiting for them.
+        pending = deque(self.programs)
+        queued = set(self.programs)
+        self.results = {}
+        result = computer.FINISH_HALT
+        while len(pending) > 0:
+            name = pending.popleft()
+            queued.discard(name)
+            program = self.programs[name]
+            self.results[name] = program.execute()
+
+            # Hand over the outputs to the channels leaving the program.
+            outputs = self.outputs[name]
+            if len(outputs) > 0:
+                for channel in leaving.get(name, []):
+                    channel.count += len(outputs)
+                    channel.batches += 1
+                    channel.last = outputs[-1]
+                    if channel.target == None:
+                        channel.values.extend(outputs)
+                    else:
+                        self.programs[channel.target].appendToInputs(outputs)
+                        if self.results.get(channel.target) == computer.FINISH_WAIT_INPUT and not channel.target in queued:
+                            queued.add(channel.target)
+                            pending.append(channel.target)
+                outputs.clear()
+
+            if self.results[name] != computer.FINISH_HALT and self.results[name] != computer.FINISH_WAIT_INPUT:
+                result = self.results[name]
+                break
+
+        self.seconds += time.perf_counter() - start
+        if result == computer.FINISH_HALT and any(code == computer.FINISH_WAIT_INPUT for code in self.results.values()):
+            result = computer.FINISH_WAIT_INPUT
+
+        return result
+
+    # Returns the values carried per second by every channel, by source and target.
+    def throughput(self):
+        return {edge: channel.count / self.seconds if self.seconds > 0 else 0 for edge, channel in self.channels.items()}
+
+    # Returns a text report with the values carried by every channel.
+    def report(self):
+        lines = ['{:<10} {:<10} {:>10} {:>8} {:>14}'.format('Source', 'Target', 'Values', 'Batches', 'Values/s')]
+        throughput = self.throughput()
+        for edge, channel in self.channels.items():
+            lines.append('{:<10} {:<10} {:>10} {:>8} {:>14.0f}'.format(str(channel.source), str(channel.target), channel.count, channel.batches, throughput[edge]))
+
+        return '\n'.join(lines)
@@ -0,0 +1,366 @@
+# symbolic.py executes Intcode programs with symbols in place of some memory cells
+# or inputs. Arithmetic on symbols builds polynomials, and comparisons or jumps on
+# them split the execution in paths, each one with the conditions it assumed. The
+# values left in memory can then be solved for the symbols, instead of executing
+# the program for every possible value.
+import itertools
+import computer
+
+# Maximum number of paths followed, and of instructions executed by each of them.
+PATH_LIMIT = 256
+STEP_LIMIT = 1000000
+
+# Conditions that a path assumes about an expression, compared with 0.
+RELATION_EQUAL = '=='
+RELATION_NOT_EQUAL = '!='
+RELATION_LESS = '<'
+RELATION_NOT_LESS = '>='
+
+# Raised when the program does something with a symbol that cannot be followed,
+# like jumping to it or writing to an address that depends on it.
+class SymbolicError(Exception):
+    pass
+
+# Polynomial with integer coefficients. Terms are kept in a dictionary from each
+# monomial, a sorted tuple of pairs of symbol name and power, to its coefficient.
+class Expression():
+    def __init__(self, terms):
+        self.terms = {monomial: coefficient for monomial, coefficient in terms.items() if coefficient != 0}
+
+    # Names of the symbols used.
+    def symbols(self):
+        return set(name for monomial in self.terms for name, power in monomial)
+
+    # Highest power of a symbol in the expression.
+    def degree(self, name):
+        return max([power for monomial in self.terms for symbolName, power in monomial if symbolName == name], default=0)
+
+    def __eq__(self, other):
+        return isinstance(other, Expression) and self.terms == other.terms
+
+    def __hash__(self):
+        return hash(frozenset(self.terms.items()))
+
+    def __repr__(self):
+        parts = []
+        for monomial in sorted(self.terms, key=lambda monomial: (-sum(power for name, power in monomial), monomial)):
+            factors = [name if power == 1 else '{}^{}'.format(name, power) for name, power in monomial]
+            coefficient = self.terms[monomial]
+            if len(factors) == 0:
+                parts.append(str(coefficient))
+            elif coefficient == 1:
+                parts.append('*'.join(factors))
+            elif coefficient == -1:
+                parts.append('-' + '*'.join(factors))
+            else:
+                parts.append('*'.join([str(coefficient)] + factors))
+
+        return ' + '.join(parts).replace('+ -', '- ')
+
+# Returns a new symbol.
+def symbol(name):
+    return Expression({((name, 1),): 1})
+
+# Turns a number into an expression.
+def toExpression(value):
+    return value if isinstance(value, Expression) else Expression({(): value})
+
+# Returns a number instead of an expression without symbols.
+def simplify(expression):
+    if len(expression.terms) == 0:
+        return 0
+    if len(expression.terms) == 1 and () in expression.terms:
+        return expression.terms[()]
+
+    return expression
+
+def add(first, second):
+    if not isinstance(first, Expression) and not isinstance(second, Expression):
+        return first + second
+
+    terms = dict(toExpression(first).terms)
+    for monomial, coefficient in toExpression(second).terms.items():
+        terms[monomial] = terms.get(monomial, 0) + coefficient
+
+    return simplify(Expression(terms))
+
+def multiply(first, second):
+    if not isinstance(first, Expression) and not isinstance(second, Expression):
+        return first * second
+
+    terms = {}
+    for firstMonomial, firstCoefficient in toExpression(first).terms.items():
+        for secondMonomial, secondCoefficient in toExpression(second).terms.items():
+            powers = dict(firstMonomial)
+            for name, power in secondMonomial:
+                powers[name] = powers.get(name, 0) + power
+            monomial = tuple(sorted(powers.items()))
+            terms[monomial] = terms.get(monomial, 0) + firstCoefficient * secondCoefficient
+
+    return simplify(Expression(terms))
+
+def subtract(first, second):
+    return add(first, multiply(second, -1))
+
+# Replaces the symbols with known values, returning a number if none is left.
+# Values read from an address that depends on symbols, kept in reads, are found
+# once the symbols of the address are known.
+def substitute(value, values, reads={}):
+    if not isinstance(value, Expression):
+        return value
+
+    result = 0
+    for monomial, coefficient in value.terms.items():
+        term = coefficient
+        for name, power in monomial:
+            known = values.get(name)
+            if known == None and name in reads:
+                known = readValue(name, values, reads)
+            term = multiply(term, powerOf(known if known != None else symbol(name), power))
+        result = add(result, term)
+
+    return result
+
+# Returns an expression raised to a power.
+def powerOf(expression, power):
+    result = 1
+    for i in range(power):
+        result = multiply(result, expression)
+
+    return result
+
+# Returns the value of a read at an address that depends on symbols, if the
+# address is known with the given values, None otherwise.
+def readValue(name, values, reads):
+    address, memory = reads[name]
+    address = substitute(address, values, reads)
+    if isinstance(address, Expression):
+        return None
+    if address < 0:
+        raise SymbolicError('read of negative address {}'.format(address))
+
+    return substitute(memory[address] if address < len(memory) else 0, values, reads)
+
+# Returns True if an expression holds a relation with 0, or None if it is not known.
+def holds(expression, relation, values, reads={}):
+    value = substitute(expression, values, reads)
+    if isinstance(value, Expression):
+        return None
+    if relation == RELATION_EQUAL:
+        return value == 0
+    elif relation == RELATION_NOT_EQUAL:
+        return value != 0
+    elif relation == RELATION_LESS:
+        return value < 0
+
+    return value >= 0
+
+# One way the execution can go, with its own memory and the conditions on the
+# symbols that make the execution go this way.
+class Path():
+    def __init__(self, memory, inputs):
+        self.memory = memory
+        self.position = 0
+        self.relativeBase = 0
+        self.inputs = inputs
+        self.outputs = []
+        self.constraints = []
+        self.finish = None
+
+        # Values read at addresses depending on symbols, by the name of the symbol
+        # that stands for them, with the address and the memory at that moment.
+        self.reads = {}
+
+    # Returns a copy that continues independently, assuming one more condition.
+    def split(self, expression, relation):
+        path = Path(computer.copyList(self.memory), computer.copyList(self.inputs))
+        path.position = self.position
+        path.relativeBase = self.relativeBase
+        path.outputs = computer.copyList(self.outputs)
+        path.constraints = self.constraints + [(expression, relation)]
+        path.reads = dict(self.reads)
+
+        return path
+
+    # Returns True if the given values of the symbols follow this path.
+    def accepts(self, values):
+        return all(holds(expression, relation, values, self.reads) for expression, relation in self.constraints)
+
+# A program executed with symbols.
+class SymbolicProgram():
+    def __init__(self, instructions):
+        self.memory = computer.copyList(instructions)
+        self.inputs = []
+
+    # Sets a value, a number or an expression, inside an address.
+    def setMemory(self, address, value):
+        while len(self.memory) <= address:
+            self.memory.append(0)
+        self.memory[address] = value
+
+    # Receives the inputs, numbers or expressions.
+    def setInputs(self, inputs):
+        self.inputs = computer.copyList(inputs)
+
+    # Executes the program following every path it can take, and returns the
+    # paths. Paths finish when they halt, or when they need an input and there
+    # are none left.
+    def execute(self):
+        pending = [Path(computer.copyList(self.memory), computer.copyList(self.inputs))]
+        finished = []
+        while len(pending) > 0:
+            path = pending.pop()
+            pending.extend(self.follow(path))
+            if path.finish != None:
+                finished.append(path)
+            if len(pending) + len(finished) > PATH_LIMIT:
+                raise SymbolicError('more than {} paths'.format(PATH_LIMIT))
+
+        return finished
+
+    # Executes a path until it finishes or splits. Returns the new paths.
+    def follow(self, path):
+        for step in range(STEP_LIMIT):
+            opcode = computer.Opcode(self.concrete(path, path.position, 'opcode'))
+            parameters = path.position + 1
+            if opcode.opcode == computer.OPCODE_HALT:
+                path.finish = computer.FINISH_HALT
+                return []
+            elif opcode.opcode == computer.OPCODE_SUM:
+                self.write(path, opcode, 2, add(self.read(path, opcode, 0), self.read(path, opcode, 1)))
+                path.position += 4
+            elif opcode.opcode == computer.OPCODE_MULTIPLY:
+                self.write(path, opcode, 2, multiply(self.read(path, opcode, 0), self.read(path, opcode, 1)))
+                path.position += 4
+            elif opcode.opcode == computer.OPCODE_INPUT:
+                if len(path.inputs) == 0:
+                    path.finish = computer.FINISH_WAIT_INPUT
+                    return []
+                self.write(path, opcode, 0, path.inputs.pop(0))
+                path.position += 2
+            elif opcode.opcode == computer.OPCODE_OUTPUT:
+                path.outputs.append(self.read(path, opcode, 0))
+                path.position += 2
+            elif opcode.opcode in [computer.OPCODE_JUMP_IF_TRUE, computer.OPCODE_JUMP_IF_FALSE]:
+                condition = self.read(path, opcode, 0)
+                target = self.read(path, opcode, 1)
+                if isinstance(condition, Expression):
+                    # Split in the path where the condition is 0 and the one where it is not.
+                    zero = path.split(condition, RELATION_EQUAL)
+                    other = path.split(condition, RELATION_NOT_EQUAL)
+                    jumping, staying = (other, zero) if opcode.opcode == computer.OPCODE_JUMP_IF_TRUE else (zero, other)
+                    jumping.position = self.address(target, 'jump target')
+                    staying.position += 3
+                    return [jumping, staying]
+                if (condition != 0) == (opcode.opcode == computer.OPCODE_JUMP_IF_TRUE):
+                    path.position = self.address(target, 'jump target')
+                else:
+                    path.position += 3
+            elif opcode.opcode in [computer.OPCODE_LESS_THAN, computer.OPCODE_EQUALS]:
+                difference = subtract(self.read(path, opcode, 0), self.read(path, opcode, 1))
+                if isinstance(difference, Expression):
+                    # Split in the path where the comparison is true and the one where it is not.
+                    if opcode.opcode == computer.OPCODE_LESS_THAN:
+                        true, false = path.split(difference, RELATION_LESS), path.split(difference, RELATION_NOT_LESS)
+                    else:
+                        true, false = path.split(difference, RELATION_EQUAL), path.split(difference, RELATION_NOT_EQUAL)
+                    for result, split in [(1, true), (0, false)]:
+                        self.write(split, opcode, 2, result)
+                        split.position += 4
+                    return [true, false]
+                result = difference < 0 if opcode.opcode == computer.OPCODE_LESS_THAN else difference == 0
+                self.write(path, opcode, 2, 1 if result else 0)
+                path.position += 4
+            elif opcode.opcode == computer.OPCODE_RELBASE_OFFSET:
+                path.relativeBase += self.address(self.read(path, opcode, 0), 'relative base offset')
+                path.position += 2
+            else:
+                raise SymbolicError('opcode {} not recognised at {}'.format(opcode.opcode, path.position))
+
+        raise SymbolicError('path executed more than {} instructions'.format(STEP_LIMIT))
+
+    # Returns a number that cannot be a symbol.
+    def address(self, value, use):
+        if isinstance(value, Expression):
+            raise SymbolicError('{} depends on symbols: {}'.format(use, value))
+
+        return value
+
+    # Returns the number at an address of a path, that cannot be a symbol.
+    def concrete(self, path, address, use):
+        return self.address(path.memory[address] if address < len(path.memory) else 0, use)
+
+    # Returns the value of a parameter of the current instruction.
+    def read(self, path, opcode, index):
+        cell = path.memory[path.position + index + 1] if path.position + index + 1 < len(path.memory) else 0
+        if opcode.modes[index] == computer.PARAM_MODE_VALUE:
+            return cell
+        elif opcode.modes[index] == computer.PARAM_MODE_RELATIVE:
+            cell = add(cell, path.relativeBase)
+
+        # A read at an address that depends on symbols stands for a new symbol,
+        # whose value is found once the address is known.
+        if isinstance(cell, Expression):
+            name = '[{}]#{}'.format(cell, len(path.reads))
+            path.reads[name] = (cell, computer.copyList(path.memory))
+            return symbol(name)
+        if cell < 0:
+            raise IndexError('address {} is negative'.format(cell))
+
+        return path.memory[cell] if cell < len(path.memory) else 0
+
+    # Stores a value at the address of a parameter of the current instruction.
+    def write(self, path, opcode, index, value):
+        cell = path.memory[path.position + index + 1] if path.position + index + 1 < len(path.memory) else 0
+        if opcode.modes[index] == computer.PARAM_MODE_VALUE:
+            return
+        elif opcode.modes[index] == computer.PARAM_MODE_RELATIVE:
+            cell = add(cell, path.relativeBase)
+        address = self.address(cell, 'written address')
+        if address < 0:
+            raise IndexError('address {} is negative'.format(address))
+        while len(path.memory) <= address:
+            path.memory.append(0)
+        path.memory[address] = value
+
+# Returns the values of the symbols, taken from their domains, for which the
+# expression equals the target in the given path. The symbol in which the
+# expression is linear with the most values is solved for, and the values of the
+# rest are tried one by one.
+def solve(expression, target, domains, path=None):
+    difference = subtract(expression, target)
+    reads = path.reads if path != None else {}
+    names = sorted(domains)
+
+    # Choose the symbol to solve for. Reads depending on it are not allowed.
+    linear = None
+    if isinstance(difference, Expression):
+        used = difference.symbols()
+        for name in sorted(names, key=lambda name: -len(domains[name])):
+            if name in used and difference.degree(name) == 1 and not any(name in toExpression(reads[read][0]).symbols() for read in used if read in reads):
+                linear = name
+                break
+
+    solutions = []
+    others = [name for name in names if name != linear]
+    for combination in itertools.product(*[domains[name] for name in others]):
+        values = dict(zip(others, combination))
+        remaining = substitute(difference, values, reads)
+        if linear == None:
+            candidates = [values] if remaining == 0 else []
+        elif not isinstance(remaining, Expression):
+            # The symbol solved for is gone, so any of its values works or none does.
+            candidates = [{**values, linear: value} for value in domains[linear]] if remaining == 0 else []
+        else:
+            # What remains is a times the symbol plus b, unless other symbols are left.
+            a = remaining.terms.get(((linear, 1),), 0)
+            b = remaining.terms.get((), 0)
+            candidates = []
+            if set(remaining.terms) <= {((linear, 1),), ()} and -b % a == 0 and -b // a in domains[linear]:
+                candidates = [{**values, linear: -b // a}]
+
+        for candidate in candidates:
+            if path == None or path.accepts(candidate):
+                solutions.append(candidate)
+
+    return solutions